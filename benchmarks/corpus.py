@@ -0,0 +1,146 @@
+"""
+Deterministic synthetic image corpus for the benchmarks. The same 'n' and
+'seed' always give the same files, byte for byte, so timings from different
+commits are measured on identical inputs.
+
+    python benchmarks/corpus.py /tmp/ivpy_corpus --n 200
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+"""
+Format, mode, and save options cycled through the corpus. JPEGs dominate, as
+in most real collections; the rest cover the decode paths ivpy special-cases
+(palette and alpha PNGs, grayscale, 16-bit and RGB TIFFs).
+"""
+KINDS = [
+    ('jpg','RGB',{'quality':90}),
+    ('jpg','RGB',{'quality':75,'progressive':True}),
+    ('jpg','L',{'quality':90}),
+    ('png','RGB',{}),
+    ('png','RGBA',{}),
+    ('png','P',{}),
+    ('tif','RGB',{}),
+    ('tif','I;16',{}),
+]
+
+SIDES = [64,200,480,800,1200,1600]
+TEXTURESIDE = 1100 # large enough for the roughness and tifpass crops
+
+#------------------------------------------------------------------------------
+
+def make_corpus(outdir,n=200,seed=0,ntexture=4):
+
+    """
+    Writes 'n' images to 'outdir' (and 'ntexture' large RGB TIFFs to
+    'outdir/texture'). Files are reused only if 'outdir/manifest.json' shows
+    they were written with the same n, seed, and ntexture; otherwise they
+    are all rewritten. Returns a DataFrame with one row per image: path,
+    format, mode, width, height, plus two synthetic numeric columns and a
+    category for plotting.
+    """
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(outdir,'texture'),exist_ok=True)
+
+    manifest = {'n':n,'seed':seed,'ntexture':ntexture}
+    manifestpath = os.path.join(outdir,'manifest.json')
+    reuse = _readmanifest(manifestpath)==manifest
+    if not reuse and os.path.exists(manifestpath):
+        os.remove(manifestpath) # a run cut short mustn't be trusted later
+
+    rows = []
+    for i in range(n):
+        fmt,mode,opts = KINDS[i % len(KINDS)]
+        w,h = rng.choice(SIDES,2)
+        path = os.path.join(outdir,'%05d.%s' % (i,fmt))
+        arr = _pixels(rng,int(w),int(h)) # drawn either way, to keep rng in step
+        if not reuse or not os.path.exists(path):
+            _save(arr,mode,path,opts)
+        rows.append({'path':path,'format':fmt,'mode':mode,
+                     'width':int(w),'height':int(h)})
+
+    df = pd.DataFrame(rows)
+    df['x'] = rng.normal(size=n)
+    df['y'] = rng.normal(size=n)
+    df['group'] = rng.choice(list('abcd'),n)
+
+    for i in range(ntexture):
+        path = os.path.join(outdir,'texture','%03d.tif' % i)
+        arr = _pixels(rng,TEXTURESIDE,TEXTURESIDE,grain=True)
+        if not reuse or not os.path.exists(path):
+            Image.fromarray(arr,'RGB').save(path)
+
+    if not reuse:
+        with open(manifestpath,'w') as f:
+            json.dump(manifest,f)
+
+    return df
+
+def texturepaths(outdir):
+    """Paths of the textures the last make_corpus() call wrote to 'outdir'"""
+    ntexture = _readmanifest(os.path.join(outdir,'manifest.json'))['ntexture']
+    return pd.Series([os.path.join(outdir,'texture','%03d.tif' % i)
+                      for i in range(ntexture)])
+
+#------------------------------------------------------------------------------
+
+def _readmanifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError,ValueError):
+        return None
+
+def _pixels(rng,w,h,grain=False):
+
+    """
+    A smooth colour gradient with a few soft blobs and some noise: compresses
+    and decodes like a photograph rather than like pure noise or a flat fill.
+    """
+
+    yy,xx = np.mgrid[0:h,0:w].astype(np.float32)
+    xx /= w
+    yy /= h
+
+    c0,c1 = rng.uniform(0,255,(2,3)).astype(np.float32)
+    arr = c0 + (c1-c0) * ((xx + yy) / 2)[:,:,None]
+    for _ in range(3):
+        cx,cy,r = rng.uniform(0,1,3)
+        blob = np.exp(-((xx-cx)**2 + (yy-cy)**2) / (2 * (0.05 + r*0.2)**2))
+        arr += rng.uniform(-120,120,3).astype(np.float32) * blob[:,:,None]
+
+    sigma = 40 if grain else 8
+    arr += rng.normal(0,sigma,(h,w,1)).astype(np.float32)
+
+    return np.clip(arr,0,255).astype(np.uint8)
+
+def _save(arr,mode,path,opts):
+    im = Image.fromarray(arr,'RGB')
+    if mode=='L':
+        im = im.convert('L')
+    elif mode=='RGBA':
+        alpha = Image.linear_gradient('L').resize(im.size)
+        im.putalpha(alpha)
+    elif mode=='P':
+        im = im.quantize(64)
+    elif mode=='I;16':
+        im = Image.fromarray(arr.mean(axis=2).astype(np.uint16) * 257)
+    im.save(path,**opts)
+
+#------------------------------------------------------------------------------
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('outdir')
+    parser.add_argument('--n',type=int,default=200)
+    parser.add_argument('--seed',type=int,default=0)
+    args = parser.parse_args()
+
+    df = make_corpus(args.outdir,args.n,args.seed)
+    print(df.groupby(['format','mode']).size().to_string())
@@ -0,0 +1,79 @@
+"""
+Checks that `import ivpy` stays fast: measures the import in fresh
+interpreters and fails (exit status 1) if the best time is over budget, or
+if any heavy backend was loaded as a side effect.
+
+    python benchmarks/importtime.py --budget 500
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE),'src')
+
+"""
+Backends that must only be imported when a function that needs them runs.
+"""
+HEAVY = ['requests','scipy','sklearn','skimage','matplotlib','tifffile','cv2',
+         'torch','torchvision','umap','hdbscan','annoy','glob2']
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import ivpy
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds':elapsed,
+                  'loaded':[m for m in %r if m in sys.modules]}))
+"""
+
+#------------------------------------------------------------------------------
+
+def measure(runs=5):
+
+    """
+    Times `import ivpy` in 'runs' fresh interpreters (so nothing is cached in
+    sys.modules). Returns the best and all times, in seconds, and which heavy
+    modules were loaded.
+    """
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = SRC + os.pathsep + env.get('PYTHONPATH','')
+    env.pop('IVPY_PROFILE',None)
+
+    times = []
+    loaded = []
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable,'-c',PROBE % HEAVY],
+                                      env=env,cwd=HERE)
+        result = json.loads(out.decode().strip().split('\n')[-1])
+        times.append(result['seconds'])
+        loaded = result['loaded']
+
+    return {'min':min(times),'times':times,'loaded':loaded}
+
+def check(budget=0.5,runs=5):
+    """Returns (ok, report); 'budget' is in seconds"""
+    result = measure(runs)
+    result['budget'] = budget
+    ok = result['min'] <= budget and len(result['loaded'])==0
+    return ok,result
+
+#------------------------------------------------------------------------------
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--budget',type=float,default=500,help='milliseconds')
+    parser.add_argument('--runs',type=int,default=5)
+    args = parser.parse_args()
+
+    ok,result = check(args.budget/1000.0,args.runs)
+    print("import ivpy: %.0f ms (budget %.0f ms)" % (1000*result['min'],
+                                                      args.budget))
+    if result['loaded']:
+        print("heavy modules loaded at import:",", ".join(result['loaded']))
+
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,309 @@
+"""
+Times ivpy's main entry points on the synthetic corpus and writes a JSON
+report, tagged with the git commit, so runs can be compared across commits.
+
+    python benchmarks/run.py --n 200 --out before.json
+    python benchmarks/run.py --n 200 --out after.json --compare before.json
+
+Benchmarks whose optional dependencies are missing (torch, cv2, hdbscan, ...)
+are recorded as skipped rather than failing the run.
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+sys.path.insert(0,os.path.join(REPO,'src'))
+sys.path.insert(0,HERE)
+
+from corpus import make_corpus, texturepaths
+from importtime import measure as measureimport
+
+BENCHMARKS = [] # (name, func), in run order
+
+def bench(name):
+    def register(func):
+        BENCHMARKS.append((name,func))
+        return func
+    return register
+
+#------------------------------------------------------------------------------
+
+FEATURES = ['brightness','saturation','hue','entropy','std','contrast',
+            'dissimilarity','homogeneity','ASM','energy','correlation',
+            'neural','condition','roughness']
+
+"""
+extract() catches per-image errors and returns None for them, so features
+with optional dependencies import those first, to be skipped when missing
+instead of timing a column of failures.
+"""
+REQUIRES = {'neural':['torch','torchvision'],'roughness':['cv2','tifffile']}
+
+def _extractbench(feature):
+    def run(ctx):
+        for module in REQUIRES.get(feature,[]):
+            __import__(module)
+        from ivpy.extract import extract
+        if feature=='roughness':
+            pathcol = ctx['texture']
+        else:
+            pathcol = ctx['pathcol']
+        if feature=='condition':
+            return extract(feature,pathcol=pathcol,savemap=False)
+        return extract(feature,pathcol=pathcol)
+    return run
+
+for feature in FEATURES:
+    bench('extract.' + feature)(_extractbench(feature))
+
+@bench('plot.show')
+def _show(ctx):
+    from ivpy.plot import show
+    return show(pathcol=ctx['plotdf'].path,xcol=ctx['plotdf'].x)
+
+@bench('plot.montage')
+def _montage(ctx):
+    from ivpy.plot import montage
+    return montage(pathcol=ctx['plotdf'].path,xcol=ctx['plotdf'].x,thumb=64)
+
+@bench('plot.montage.facet')
+def _montagefacet(ctx):
+    from ivpy.plot import montage
+    return montage(pathcol=ctx['plotdf'].path,facetcol=ctx['plotdf'].group,thumb=64)
+
+@bench('plot.histogram')
+def _histogram(ctx):
+    from ivpy.plot import histogram
+    return histogram(xcol=ctx['plotdf'].x,pathcol=ctx['plotdf'].path,bins=20,thumb=32)
+
+@bench('plot.histogram.polar')
+def _histogrampolar(ctx):
+    from ivpy.plot import histogram
+    return histogram(xcol=ctx['plotdf'].x,pathcol=ctx['plotdf'].path,bins=20,thumb=32,
+                     coordinates='polar')
+
+@bench('plot.scatter')
+def _scatter(ctx):
+    from ivpy.plot import scatter
+    return scatter(xcol=ctx['plotdf'].x,ycol=ctx['plotdf'].y,pathcol=ctx['plotdf'].path,
+                   side=1200,thumb=48)
+
+@bench('plot.scatter.dot')
+def _scatterdot(ctx):
+    from ivpy.plot import scatter
+    return scatter(xcol=ctx['plotdf'].x,ycol=ctx['plotdf'].y,pathcol=ctx['plotdf'].path,
+                   side=1200,thumb=8,dot=True)
+
+@bench('plot.compose')
+def _compose(ctx):
+    from ivpy.plot import compose
+    return compose(*ctx['canvases'],ncols=3)
+
+@bench('glyph.draw_glyphs')
+def _glyphs(ctx):
+    from ivpy.glyph import draw_glyphs
+    return draw_glyphs(ctx['unitX'],side=200)
+
+@bench('analysis.nearest')
+def _nearest(ctx):
+    from ivpy.analysis import nearest
+    X = ctx['X']
+    return nearest(X=X,i=X.index[0],pathcol=ctx['pathcol'],k=8,plot=False)
+
+@bench('analysis.neighbors')
+def _neighbors(ctx):
+    from ivpy.analysis import neighbors
+    return neighbors(ctx['X'],k=8)
+
+@bench('analysis.neighbors.annoy')
+def _neighborsannoy(ctx):
+    from ivpy.analysis import neighbors
+    return neighbors(ctx['X'],k=8,engine='annoy')
+
+@bench('analysis.knn_graph')
+def _knngraph(ctx):
+    from ivpy.analysis import knn_graph
+    return knn_graph(ctx['X'],k=15,cache=False)
+
+@bench('analysis.duplicates')
+def _duplicates(ctx):
+    from ivpy.analysis import duplicates
+    return duplicates(ctx['pathcol'],threshold=4)
+
+@bench('cluster.kmeans')
+def _kmeans(ctx):
+    from ivpy.cluster import cluster
+    return cluster(ctx['X'],method='kmeans',k=8,n_init=1,random_state=0)
+
+@bench('cluster.hierarchical')
+def _hierarchical(ctx):
+    from ivpy.cluster import cluster
+    return cluster(ctx['X'],method='hierarchical',k=8)
+
+@bench('utils.resize')
+def _resize(ctx):
+    from ivpy.utils import resize
+    return resize(savedir=ctx['scratch'],pathcol=ctx['pathcol'],thumb=128)
+
+@bench('utils.tifpass')
+def _tifpass(ctx):
+    import cv2
+    from ivpy.utils import tifpass
+    return tifpass(savedir=ctx['scratch'],pathcol=ctx['texture'],N=512)
+
+@bench('utils.tifprocess')
+def _tifprocess(ctx):
+    from ivpy.utils import tifprocess
+    return tifprocess(savedir=ctx['scratch'],pathcol=ctx['texture'])
+
+#------------------------------------------------------------------------------
+
+def _context(corpusdir,n,seed,scratch):
+    df = make_corpus(corpusdir,n,seed)
+
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n,64)),index=df.index)
+    unitX = pd.DataFrame(rng.uniform(size=(min(n,100),8)))
+
+    from PIL import Image
+    canvases = [Image.new('RGB',(800,800),tuple(rng.integers(0,255,3).tolist()))
+                for _ in range(9)]
+
+    # PIL cannot paste 16-bit grayscale onto the plots' RGB canvases
+    plotdf = df[df['mode']!='I;16']
+
+    return {'df':df,'pathcol':df.path,'plotdf':plotdf,'texture':texturepaths(corpusdir),
+            'X':X,'unitX':unitX,'canvases':canvases,'scratch':scratch}
+
+def _timeit(func,ctx,repeat):
+
+    """
+    Runs 'func' once to warm up (imports, font and model loading), then
+    'repeat' more times. Printed output (progress bars, per-image
+    tracebacks) is suppressed.
+    """
+
+    times = []
+    for r in range(repeat+1):
+        with contextlib.redirect_stdout(io.StringIO()), \
+             contextlib.redirect_stderr(io.StringIO()):
+            start = time.perf_counter()
+            func(ctx)
+            elapsed = time.perf_counter() - start
+        if r > 0:
+            times.append(elapsed)
+    return times
+
+def _gitinfo():
+    try:
+        commit = subprocess.check_output(['git','-C',REPO,'rev-parse','HEAD'],
+                                         stderr=subprocess.DEVNULL).decode().strip()
+        status = subprocess.check_output(['git','-C',REPO,'status','--porcelain',
+                                          '--untracked-files=no'],
+                                         stderr=subprocess.DEVNULL).decode()
+        return commit,len(status.strip()) > 0
+    except Exception:
+        return None,None
+
+def _versions():
+    versions = {'python':platform.python_version()}
+    for module in ['numpy','pandas','PIL','sklearn','skimage','scipy','annoy']:
+        try:
+            versions[module] = __import__(module).__version__
+        except Exception:
+            versions[module] = None
+    return versions
+
+def run(corpusdir,n=200,seed=0,repeat=3,only=None):
+
+    """
+    Runs every registered benchmark whose name contains one of the strings in
+    'only' (all of them if None), and returns the report as a dict.
+    """
+
+    commit,dirty = _gitinfo()
+    report = {'commit':commit,
+              'dirty':dirty,
+              'timestamp':time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'platform':platform.platform(),
+              'cpus':os.cpu_count(),
+              'versions':_versions(),
+              'corpus':{'n':n,'seed':seed},
+              'repeat':repeat,
+              'import':measureimport(3),
+              'results':{}}
+    print('%-28s %9.4fs' % ('import ivpy',report['import']['min']))
+
+    scratch = tempfile.mkdtemp(prefix='ivpy_bench_')
+    try:
+        ctx = _context(corpusdir,n,seed,scratch)
+        for name,func in BENCHMARKS:
+            if only is not None and not any([item in name for item in only]):
+                continue
+            try:
+                times = _timeit(func,ctx,repeat)
+                result = {'status':'ok',
+                          'min':min(times),
+                          'median':float(np.median(times)),
+                          'times':times}
+            except (ImportError,NameError) as e: # NameError: optional import failed at module load
+                result = {'status':'skipped','reason':repr(e)}
+            except Exception as e:
+                result = {'status':'error','reason':repr(e)}
+            report['results'][name] = result
+            print(_line(name,result))
+    finally:
+        shutil.rmtree(scratch,ignore_errors=True)
+
+    return report
+
+def _line(name,result,baseline=None):
+    if result['status']!='ok':
+        return '%-28s %s: %s' % (name,result['status'],result['reason'][:60])
+    line = '%-28s %9.4fs' % (name,result['min'])
+    if baseline is not None and baseline.get('status')=='ok':
+        line += '   %6.2fx vs %9.4fs' % (baseline['min'] / result['min'],baseline['min'])
+    return line
+
+def compare(report,baselinereport):
+    """Prints each benchmark's best time beside the baseline's, with speedup"""
+    print('\nvs %s' % baselinereport.get('commit'))
+    for name,result in report['results'].items():
+        print(_line(name,result,baselinereport['results'].get(name)))
+
+#------------------------------------------------------------------------------
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--corpus',default=os.path.join(tempfile.gettempdir(),
+                                                        'ivpy_corpus'))
+    parser.add_argument('--n',type=int,default=200)
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--repeat',type=int,default=3)
+    parser.add_argument('--only',nargs='*',help='substrings of benchmark names')
+    parser.add_argument('--out',default='ivpy_bench.json')
+    parser.add_argument('--compare',help='earlier report to compare against')
+    args = parser.parse_args()
+
+    report = run(args.corpus,args.n,args.seed,args.repeat,args.only)
+
+    with open(args.out,'w') as f:
+        json.dump(report,f,indent=2)
+    print('wrote',args.out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report,json.load(f))
@@ -5,4 +5,8 @@ __email__ = 'damoncrockett@gmail.com'
 __version__ = '0.0.1'
 
 from ivpy.data import attach,detach
-from ivpy.plot import show,montage,histogram,scatter,compose,line
+from ivpy.plot import show,montage,histogram,scatter,compose,line,progressive
+from ivpy.plot import canvasconfig
+from ivpy.atlas import use_atlas,drop_atlas
+from ivpy.fetch import fetchconfig,clear_cache
+from ivpy.timing import profile
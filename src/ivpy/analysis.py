@@ -1,7 +1,14 @@
-from annoy import AnnoyIndex
-from .data import _typecheck,_pathfilter,_featfilter,seq_types
-from .plot import show,montage
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import pandas as pd
+from PIL import Image
+from .data import _typecheck,_pathfilter,_featfilter,int_types,seq_types
+from .plot import show,montage
+from .fetch import _localize
 
 """
 Currently this function will use show() to display k nearest neighbors of i,
@@ -17,34 +24,51 @@ def nearest(X=None,
             notecol=None,
             thumb=False,
             bg='white',
-            plot=True):
+            plot=True,
+            index=None,
+            engine='auto',
+            graph=None):
+
+    """
+    Args:
+        X (DataFrame) --- feature matrix; not needed if 'index' is given
+        i --- index label of the target item; random if None
+        k (int) --- number of neighbors, including the target itself
+        index (NeighborIndex) --- prebuilt index over X, reused across calls
+            instead of building a new one each time
+        engine (str) --- 'exact', 'annoy' (approximate), or 'auto'; see
+            NeighborIndex
+        graph (sparse matrix) --- precomputed knn_graph() over X; its rows
+            are read instead of searching, so k must be at most one more
+            than the graph's k
+    """
 
     if isinstance(pathcol,int): # allowable for show(), blocked by _paste()
         raise TypeError("'pathcol' must be a pandas Series")
-    if X is None:
-        raise ValueError("Must supply feature matrix 'X'")
+    if X is None and index is None:
+        raise ValueError("Must supply feature matrix 'X' or a NeighborIndex")
+    if index is not None and not isinstance(index,NeighborIndex):
+        raise TypeError("'index' must be a NeighborIndex")
+    if graph is not None and X is None:
+        raise ValueError("Must supply the feature matrix 'X' of 'graph'")
     if i is None:
-        i = np.random.choice(X.index)
+        i = np.random.choice(X.index if index is None else index.labels)
     if isinstance(i,seq_types): # can be seq in cut()
         raise ValueError("Must choose a single 'i' as target")
 
-    _typecheck(**locals())
+    if X is None: # the index stands in for X
+        _typecheck(**{key:val for key,val in locals().items() if key!='X'})
+    else:
+        _typecheck(**locals())
     pathcol = _pathfilter(pathcol)
     notecol = _featfilter(pathcol,notecol)
 
-    f = X.shape[1] # number of columns in X
-    t = AnnoyIndex(f, metric='angular')  # Length of item vector that will be indexed
-
-    for idx, item in enumerate(X.index):
-        t.add_item(idx, list(X.loc[item]))
-
-
-    idmap = dict(zip(X.index,list(range(len(X)))))
-    idmapReverse = dict(zip(list(range(len(X))),X.index))
-
-    t.build(10) # 10 trees
-    nnsAnnoy = t.get_nns_by_item(idmap[i], k, include_distances=False) # dists?
-    nnsNative = [idmapReverse[item] for item in nnsAnnoy]
+    if graph is not None:
+        nnsNative = _graphrow(graph,X.index,i,k)
+    else:
+        if index is None:
+            index = NeighborIndex(X,engine=engine)
+        nnsNative = index.query(i,k)
 
     if plot in [True,'show']:
         print(nnsNative)
@@ -66,3 +90,696 @@ def nearest(X=None,
                         thumb=thumb,bg=bg)
     elif plot==False:
         return nnsNative
+
+def _graphrow(graph,labels,i,k):
+    """Labels of 'i' and its k-1 nearest neighbors in a knn_graph()"""
+    graph = graph.tocsr()
+    position = labels.get_loc(i)
+    row = slice(graph.indptr[position],graph.indptr[position+1])
+    if row.stop - row.start < k - 1:
+        raise ValueError("""'graph' has fewer than k-1 neighbors of 'i'; ask
+            knn_graph() for more""")
+    order = np.argsort(graph.data[row],kind='stable') # rows may be re-sorted by column
+    nns = graph.indices[row][order][:k-1]
+    return [i] + list(labels[nns])
+
+#------------------------------------------------------------------------------
+
+def neighbors(X=None,
+              queries=None,
+              k=4,
+              index=None,
+              radius=None,
+              include_self=False,
+              workers=None,
+              engine='auto'):
+
+    """
+    Nearest neighbors for many queries at once, as a tidy DataFrame with one
+    row per (query, neighbor) pair: columns 'query', 'rank' (1 is nearest),
+    'neighbor' (an index label), and 'distance'.
+
+    usage:
+
+    nn = neighbors(X,k=10,radius=0.2) # every item, e.g. for dedupe
+    nn[nn.distance < 0.05]
+
+    Args:
+        X (DataFrame) --- feature matrix; not needed if 'index' is given
+        queries --- index labels of items to query (one label, or a list,
+            Series, Index, or 1D array of them), or a DataFrame or 2D array
+            of raw query vectors; if None, every item is queried
+        k (int) --- number of neighbors per query
+        index (NeighborIndex) --- prebuilt index; built from X if None
+        radius (float) --- drop neighbors farther than this
+        include_self (Boolean) --- whether an item queried by label counts
+            as its own nearest neighbor
+        workers (int) --- query threads; defaults to the number of cores
+        engine (str) --- 'exact', 'annoy' (approximate), or 'auto', when
+            building the index from X; see NeighborIndex
+    """
+
+    if X is None and index is None:
+        raise ValueError("Must supply feature matrix 'X' or a NeighborIndex")
+    if index is not None and not isinstance(index,NeighborIndex):
+        raise TypeError("'index' must be a NeighborIndex")
+    if not isinstance(k,int_types) or k < 1:
+        raise TypeError("'k' must be a positive integer")
+    k = int(k)
+
+    if index is None:
+        index = NeighborIndex(X,engine=engine)
+
+    """
+    Queries by label ask for one extra neighbor, since the item itself comes
+    back first, and drop it afterwards.
+    """
+    byvector = isinstance(queries,pd.DataFrame) or (
+        isinstance(queries,np.ndarray) and queries.ndim==2)
+    if byvector:
+        vectors = np.asarray(queries,dtype=np.float32)
+        if vectors.ndim!=2 or vectors.shape[1]!=index.f:
+            raise ValueError("Query vectors must be rows of length %d" % index.f)
+        if isinstance(queries,pd.DataFrame):
+            names = queries.index
+        else:
+            names = pd.RangeIndex(len(vectors))
+        items = vectors
+        kq = k
+    else:
+        if queries is None:
+            names = index.labels
+        elif isinstance(queries,seq_types + (pd.Index,
+                                             pd.api.extensions.ExtensionArray)):
+            names = pd.Index(queries)
+        else:
+            names = pd.Index([queries])
+        items = index.positions(names)
+        kq = k if include_self else k + 1
+
+    found = index.search(items,kq,byvector=byvector,workers=workers)
+
+    querypos,nbrs,dists = [],[],[]
+    for q,(nns,ds) in enumerate(found):
+        if not byvector and not include_self:
+            keep = [m for m in range(len(nns)) if nns[m]!=items[q]][:k]
+            nns,ds = [nns[m] for m in keep],[ds[m] for m in keep]
+        querypos.extend([q] * len(nns))
+        nbrs.extend(nns)
+        dists.extend(ds)
+
+    querypos = np.asarray(querypos,dtype=np.int64)
+    nn = pd.DataFrame({'query':names[querypos],
+                       'rank':_ranks(querypos),
+                       'neighbor':index.labels[np.asarray(nbrs,dtype=np.int64)],
+                       'distance':np.asarray(dists,dtype=float)})
+
+    if radius is not None:
+        nn = nn[nn.distance <= radius].reset_index(drop=True)
+
+    return nn
+
+def _ranks(querypos):
+    """1,2,3... within each run of equal query positions"""
+    if len(querypos)==0:
+        return querypos
+    starts = np.flatnonzero(np.diff(querypos,prepend=-1))
+    counts = np.diff(np.append(starts,len(querypos)))
+    return np.arange(len(querypos)) - np.repeat(starts,counts) + 1
+
+#------------------------------------------------------------------------------
+
+"""
+kNN graphs are cached by the content of X (values and index), the metric, and
+the engine, so umap, tsne, clustering, and nearest() can share one. A cached
+graph with more neighbors than asked for is cut down rather than recomputed.
+The oldest graphs are dropped past GRAPH_CACHESIZE.
+"""
+
+GRAPH_CACHE = OrderedDict() # (hash, metric, engine) -> (k, graph)
+GRAPH_CACHESIZE = 4
+
+def knn_graph(X,k=15,metric='angular',engine='auto',workers=None,cache=True):
+
+    """
+    Sparse k-nearest-neighbor graph over the rows of X, as a scipy CSR matrix
+    whose rows and columns follow X's row order. Row i holds the distances
+    from item i to its k nearest neighbors (not itself), nearest first; zero
+    distances between duplicates are stored explicitly, so they still count
+    as edges. The graph's 'metric' attribute records the metric, so umap()
+    can match it.
+
+    usage:
+
+    G = knn_graph(X,k=30)
+    xy = umap(X,graph=G)
+    df['cluster'] = cluster(X,method='spectral',k=8,graph=G)
+    nearest(X,i=42,pathcol=df.filename,graph=G)
+
+    Args:
+        X (DataFrame) --- feature matrix
+        k (int) --- neighbors per item
+        metric (str) --- as in NeighborIndex
+        engine (str) --- 'exact', 'annoy', or 'auto'; see NeighborIndex
+        workers (int) --- query threads; defaults to the number of cores
+        cache (Boolean) --- whether to reuse and keep graphs in GRAPH_CACHE
+    """
+
+    if not isinstance(X,pd.DataFrame):
+        raise TypeError("'X' must be a pandas DataFrame")
+    if not isinstance(k,int_types) or k < 1:
+        raise TypeError("'k' must be a positive integer")
+    k = int(k)
+
+    n = len(X)
+    k = min(k,n-1)
+    engine = _pickengine(engine,metric,n,X.shape[1])
+
+    key = (_contenthash(X),metric,engine)
+    if cache and key in GRAPH_CACHE:
+        cachedk,graph = GRAPH_CACHE[key]
+        if cachedk >= k:
+            GRAPH_CACHE.move_to_end(key)
+            return _truncategraph(graph,k)
+
+    from scipy.sparse import csr_matrix # imported on first use
+
+    index = NeighborIndex(X,metric=metric,engine=engine)
+    found = index.search(np.arange(n),k+1,workers=workers)
+
+    indices,data,lengths = [],[],[]
+    for position,(nns,dists) in enumerate(found):
+        nns = np.asarray(nns,dtype=np.int64)
+        keep = nns!=position
+        nns,dists = nns[keep][:k],np.asarray(dists)[keep][:k]
+        indices.append(nns)
+        data.append(dists)
+        lengths.append(len(nns))
+
+    indptr = np.concatenate([[0],np.cumsum(lengths)])
+    graph = csr_matrix((np.concatenate(data).astype(np.float32),
+                        np.concatenate(indices),indptr),shape=(n,n))
+    graph.metric = metric
+
+    if cache:
+        GRAPH_CACHE[key] = (k,graph)
+        GRAPH_CACHE.move_to_end(key)
+        while len(GRAPH_CACHE) > GRAPH_CACHESIZE:
+            GRAPH_CACHE.popitem(last=False)
+
+    return graph
+
+def _contenthash(X):
+    rowhashes = pd.util.hash_pandas_object(X,index=True).to_numpy()
+    digest = hashlib.blake2b(rowhashes.tobytes(),digest_size=16)
+    digest.update(str(X.shape).encode())
+    return digest.hexdigest()
+
+def _truncategraph(graph,k):
+    """The nearest k entries of each row"""
+    lengths = np.diff(graph.indptr)
+    if lengths.max(initial=0) <= k:
+        return graph
+    rows = np.repeat(np.arange(len(lengths)),lengths)
+    order = np.lexsort((graph.data,rows)) # rows may be re-sorted by column
+    keep = order[_ranks(rows) <= k]
+    indptr = np.concatenate([[0],np.cumsum(np.minimum(lengths,k))])
+    truncated = type(graph)((graph.data[keep],graph.indices[keep],indptr),
+                            shape=graph.shape)
+    truncated.metric = graph.metric
+    return truncated
+
+#------------------------------------------------------------------------------
+
+"""
+The exact engine scores queries against every item with float32 matrix
+multiplication, a block of query rows at a time. EXACT_MAXBYTES bounds the
+scratch memory of the blocks in flight, and 'auto' picks exact search while
+the whole matrix stays under EXACT_MAXSIZE values (e.g., 65k items in 512
+dimensions, or 260k in 128), where it beats Annoy on recall and build time.
+"""
+
+EXACT_METRICS = ['angular','euclidean','dot']
+EXACT_MAXSIZE = 2**25
+EXACT_MAXBYTES = 2**28
+
+class NeighborIndex:
+
+    """
+    Nearest-neighbor index over the rows of a feature matrix, built once and
+    reused by nearest() and neighbors() across calls. The search is either
+    exact (blocked matrix multiplication) or approximate (Annoy). It can be
+    saved to disk and loaded back memory-mapped, so reopening even a very
+    large index is nearly instant, and several processes can share one copy.
+
+    usage:
+
+    index = NeighborIndex(X) # or NeighborIndex.load('feats.ann')
+    index.save('feats.ann')
+    nearest(i=42,pathcol=df.filename,index=index)
+
+    Args:
+        X (DataFrame) --- feature matrix; its index labels the items
+        metric (str) --- 'angular', 'euclidean', 'manhattan', 'hamming',
+            or 'dot'; the exact engine supports the first two and 'dot'
+        n_trees (int) --- more trees give better recall, a larger index,
+            and a slower build (Annoy only)
+        n_jobs (int) --- threads used to build; -1 uses all cores
+        engine (str) --- 'exact', 'annoy', or 'auto', which is exact for
+            supported metrics when items x dimensions <= EXACT_MAXSIZE
+    """
+
+    def __init__(self,X=None,metric='angular',n_trees=10,n_jobs=-1,engine='auto'):
+        self.metric = metric
+        self.n_trees = n_trees
+        self.engine = engine
+        self.annoy = None
+        self.vectors = None
+        if X is None: # see load()
+            return
+
+        if not isinstance(X,pd.DataFrame):
+            raise TypeError("'X' must be a pandas DataFrame")
+
+        self.labels = X.index
+        self.f = X.shape[1]
+        self.engine = _pickengine(engine,metric,len(X),self.f)
+
+        """
+        Annoy has no bulk insert, but the costly part of the old loop was the
+        per-row pandas lookup and list conversion, not add_item itself. One
+        float32 copy of X, then rows straight from the array.
+        """
+        vectors = np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+        if self.engine=='exact':
+            self._setvectors(_exactvectors(vectors,metric))
+            return
+
+        from annoy import AnnoyIndex # imported on first use
+
+        self.annoy = AnnoyIndex(self.f,metric)
+        add = self.annoy.add_item
+        for position in range(len(vectors)):
+            add(position,vectors[position])
+
+        self.annoy.build(n_trees,n_jobs=n_jobs)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __repr__(self):
+        if self.engine=='exact':
+            return "<NeighborIndex: %d items, %d dims, %s, exact>" % (
+                len(self),self.f,self.metric)
+        return "<NeighborIndex: %d items, %d dims, %s, %d trees>" % (
+            len(self),self.f,self.metric,self.n_trees)
+
+    def _setvectors(self,vectors):
+        self.vectors = vectors
+        self.sqnorms = None
+        if self.metric=='euclidean':
+            self.sqnorms = np.einsum('ij,ij->i',vectors,vectors)
+
+    def positions(self,labels):
+        """Item numbers of index 'labels'"""
+        positions = self.labels.get_indexer(labels)
+        if (positions < 0).any():
+            missing = list(np.asarray(labels)[positions < 0][:5])
+            raise KeyError("Not in the index: %s" % missing)
+        return positions
+
+    def query(self,i,k=4,distances=False):
+
+        """
+        The k nearest neighbors of item 'i' (an index label), nearest first
+        and including 'i' itself, as index labels; with distances, also
+        returns the list of distances.
+        """
+
+        position = self.positions([i])
+        nns,dists = self.search(position,k,workers=1)[0]
+        nns = list(self.labels[np.asarray(nns,dtype=np.int64)])
+        if distances:
+            return nns,[float(dist) for dist in dists]
+        return nns
+
+    def search(self,queries,k,byvector=False,workers=None):
+
+        """
+        The k nearest items to each query, nearest first, as a list of
+        (positions, distances) pairs. Queries are item positions or, with
+        byvector, the rows of a 2D array. Distances are Annoy's for the
+        metric, whichever the engine: for 'angular', sqrt(2 - 2cos).
+        """
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if self.engine=='exact':
+            return self._exactsearch(queries,k,byvector,workers)
+
+        """
+        Annoy releases the GIL while it searches, so chunks of queries run in
+        parallel threads.
+        """
+        if byvector:
+            search = self.annoy.get_nns_by_vector
+            items = list(queries)
+        else:
+            search = self.annoy.get_nns_by_item
+            items = [int(item) for item in queries]
+
+        def run(chunk):
+            return [search(item,k,include_distances=True) for item in chunk]
+
+        nchunks = max(min(workers * 4,len(items)),1)
+        chunks = [items[j::nchunks] for j in range(nchunks)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run,chunks))
+
+        # undo the striping back into query order
+        found = [None] * len(items)
+        for j,chunkresults in enumerate(results):
+            found[j::nchunks] = chunkresults
+
+        return found
+
+    def _exactsearch(self,queries,k,byvector,workers):
+
+        """
+        Each block holds a float32 score and an int64 argpartition entry per
+        (query, item), 12 bytes, so the block height is what fits in the
+        byte budget split across workers. BLAS and argpartition release the
+        GIL, so blocks run in parallel threads.
+        """
+
+        n = len(self)
+        k = min(k,n)
+        if byvector:
+            queries = _exactvectors(np.asarray(queries,dtype=np.float32),
+                                    self.metric)
+        rows = max(1,int(EXACT_MAXBYTES // (12 * n * workers)))
+        blocks = [queries[j:j+rows] for j in range(0,len(queries),rows)]
+
+        def run(block):
+            B = block if byvector else np.asarray(self.vectors[block])
+            scores = B @ self.vectors.T # larger is nearer
+            if self.metric=='euclidean':
+                scores *= 2
+                scores -= self.sqnorms
+            top = np.argpartition(scores,n-k,axis=1)[:,n-k:]
+            topscores = np.take_along_axis(scores,top,axis=1)
+            order = np.argsort(-topscores,axis=1,kind='stable')
+            top = np.take_along_axis(top,order,axis=1)
+            topscores = np.take_along_axis(topscores,order,axis=1)
+            return top,_exactdistances(topscores,B,self.metric)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run,blocks))
+
+        found = []
+        for top,dists in results:
+            found.extend(zip(top,dists))
+        return found
+
+    def save(self,path):
+
+        """
+        Writes the index to 'path', its settings to 'path.json', and its
+        labels to 'path.labels'. Labels are pickled, so any index survives
+        the round trip: tuples and MultiIndexes, timestamps, dtype and name.
+        """
+
+        if self.engine=='exact':
+            with open(path,'wb') as f:
+                np.save(f,self.vectors)
+        else:
+            self.annoy.save(path)
+        meta = {'f':self.f,
+                'metric':self.metric,
+                'n_trees':self.n_trees,
+                'engine':self.engine}
+        with open(path + '.json','w') as f:
+            json.dump(meta,f)
+        pd.to_pickle(self.labels,path + '.labels')
+
+    @classmethod
+    def load(cls,path):
+        """
+        Opens a saved index; the tree or vector file is memory-mapped, not
+        read. Only open files you trust, since the labels are unpickled.
+        """
+
+        if not os.path.exists(path + '.json'):
+            raise ValueError("No NeighborIndex settings found at '%s.json'" % path)
+        with open(path + '.json') as f:
+            meta = json.load(f)
+
+        index = cls(metric=meta['metric'],n_trees=meta['n_trees'],
+                    engine=meta.get('engine','annoy'))
+        index.f = meta['f']
+        index.labels = pd.read_pickle(path + '.labels')
+        if index.engine=='exact':
+            index._setvectors(np.load(path,mmap_mode='r'))
+            return index
+
+        from annoy import AnnoyIndex # imported on first use
+
+        index.annoy = AnnoyIndex(index.f,index.metric)
+        index.annoy.load(path) # mmap
+
+        return index
+
+def _pickengine(engine,metric,n,d):
+    if engine not in ['auto','exact','annoy']:
+        raise ValueError("'engine' must be 'auto', 'exact', or 'annoy'")
+    if engine=='exact' and metric not in EXACT_METRICS:
+        raise ValueError("""The exact engine supports metrics %s; use
+            engine='annoy' for '%s'""" % (EXACT_METRICS,metric))
+    if engine=='auto':
+        if metric in EXACT_METRICS and n * d <= EXACT_MAXSIZE:
+            return 'exact'
+        return 'annoy'
+    return engine
+
+def _exactvectors(vectors,metric):
+    """Unit rows for 'angular', so scores are cosines; zero rows stay zero"""
+    if metric!='angular':
+        return vectors
+    norms = np.sqrt(np.einsum('ij,ij->i',vectors,vectors))
+    norms[norms==0] = 1
+    return vectors / norms[:,np.newaxis]
+
+def _exactdistances(scores,B,metric):
+    """Annoy's distances from exact scores, to match its output"""
+    if metric=='angular':
+        return np.sqrt(np.maximum(2 - 2 * scores,0))
+    if metric=='euclidean':
+        sqnorms = np.einsum('ij,ij->i',B,B)[:,np.newaxis]
+        return np.sqrt(np.maximum(sqnorms - scores,0))
+    return scores # dot: Annoy reports the product itself
+
+#------------------------------------------------------------------------------
+
+"""
+Near-duplicates (re-scans, crops, re-encodings) by perceptual hash. Each image
+is reduced to 64 bits, packed in a uint64, and two images are near-duplicates
+when their hashes differ in at most 'threshold' bits. duplicates() never
+compares all pairs: it splits the 64 bits into chunks, and only compares
+hashes that are close within some chunk, which by the pigeonhole principle
+every close pair is (multi-index hashing). Cost grows with the threshold and
+with the number of hashes sharing chunk values, so keep the threshold small;
+around 4 catches rescaled and re-encoded copies, 8 or so slight crops.
+
+usage:
+
+df['dupe'] = duplicates(df.filename,threshold=4)
+correct(df,'dupe')
+roster(0)
+"""
+
+HASHTYPES = ['ahash','dhash','phash']
+
+def image_hash(pathcol=None,hashtype='phash',workers=None):
+
+    """
+    64-bit perceptual hashes of the images in pathcol, as a uint64 Series
+    with the same index. Images that cannot be read are reported and left
+    out of the Series.
+
+    Args:
+        pathcol (Series) --- image paths or URLs
+        hashtype (str) --- 'ahash' (each pixel of an 8x8 thumbnail against
+            the mean), 'dhash' (horizontal gradient signs of a 9x8 thumbnail),
+            or 'phash' (the 8x8 lowest DCT frequencies of a 32x32 thumbnail
+            against their median); phash holds up best to rescaling and
+            re-encoding
+        workers (int) --- decoding threads; defaults to the number of cores
+    """
+
+    _typecheck(**locals())
+    if hashtype not in HASHTYPES:
+        raise ValueError("'hashtype' must be 'ahash', 'dhash', or 'phash'")
+    pathcol = _pathfilter(pathcol)
+    pathcol = _localize(pathcol) # remote images fetched once, concurrently
+
+    def run(impath):
+        try:
+            return _hash(impath,hashtype)
+        except Exception as e:
+            return e
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool: # PIL decodes without the GIL
+        hashes = list(pool.map(run,pathcol))
+
+    keep = []
+    for impath,item in zip(pathcol,hashes):
+        keep.append(not isinstance(item,Exception))
+        if not keep[-1]:
+            print(f"Error processing {impath}: {item}")
+
+    hashes = [item for item in hashes if not isinstance(item,Exception)]
+    return pd.Series(np.array(hashes,dtype=np.uint64),
+                     index=pathcol.index[keep],name=hashtype)
+
+def duplicates(pathcol=None,threshold=4,hashtype='phash',hashes=None,workers=None):
+
+    """
+    Groups of near-duplicate images, as a Series of group numbers (0, 1, ...)
+    with the same index as pathcol, and NaN for images with no near-duplicate.
+    Groups are transitive: if a is close to b and b to c, all three share a
+    group even if a and c are not close.
+
+    Args:
+        pathcol (Series) --- image paths or URLs; not needed if 'hashes'
+        threshold (int) --- most bits two hashes may differ in, 0 to 31
+        hashtype (str) --- 'ahash', 'dhash', or 'phash'; see image_hash()
+        hashes (Series) --- precomputed image_hash(), to try thresholds
+            without decoding again
+        workers (int) --- decoding threads; defaults to the number of cores
+    """
+
+    if not isinstance(threshold,int) or not 0 <= threshold < 32:
+        raise ValueError("'threshold' must be an integer from 0 to 31")
+
+    if hashes is None:
+        index = _pathfilter(pathcol).index
+        hashes = image_hash(pathcol,hashtype,workers)
+    else:
+        if not isinstance(hashes,pd.Series):
+            raise TypeError("'hashes' must be a pandas Series, as from image_hash()")
+        index = hashes.index if pathcol is None else _pathfilter(pathcol).index
+
+    """
+    Identical hashes collapse to one first, so exact copies cost nothing and
+    only distinct hashes are compared.
+    """
+    distinct,inverse = np.unique(hashes.to_numpy(dtype=np.uint64),return_inverse=True)
+    pairs = _closepairs(distinct,threshold)
+
+    from scipy.sparse import coo_matrix # imported on first use
+    from scipy.sparse.csgraph import connected_components
+
+    edges = coo_matrix((np.ones(len(pairs[0])),pairs),
+                       shape=(len(distinct),len(distinct)))
+    _,components = connected_components(edges,directed=False)
+    components = components[inverse]
+
+    # groups of two or more images, numbered in order of first appearance
+    grouped = np.bincount(components)[components] > 1
+    labels = np.full(len(components),np.nan)
+    codes,uniques = pd.factorize(components[grouped])
+    labels[grouped] = codes
+
+    groups = pd.Series(labels,index=hashes.index).reindex(index)
+    print(str(len(uniques)),"groups of near-duplicates,",str(int(grouped.sum())),
+          "images in all")
+    return groups
+
+def _hash(impath,hashtype):
+    im = Image.open(impath)
+    im.draft('L',(128,128)) # JPEGs decode straight to a small grayscale
+    if hashtype=='ahash':
+        pixels = _grayscale(im,(8,8))
+        bits = pixels > pixels.mean()
+    elif hashtype=='dhash':
+        pixels = _grayscale(im,(9,8))
+        bits = pixels[:,1:] > pixels[:,:-1]
+    elif hashtype=='phash':
+        pixels = _grayscale(im,(32,32))
+        dct = _DCT8 @ pixels @ _DCT8.T # lowest 8x8 of the 2D DCT-II
+        bits = dct > np.median(dct)
+    return np.packbits(bits.ravel()).view('>u8')[0] # first bit highest
+
+def _grayscale(im,size):
+    """Float grayscale thumbnail; 16-bit and float images rescaled to 0-255"""
+    if im.mode in ['I;16','I;16B','I;16L','I','F']:
+        pixels = np.asarray(im,dtype=float)
+        top = pixels.max()
+        pixels = pixels * (255.0 / top) if top > 0 else pixels
+        im = Image.fromarray(pixels.astype(np.uint8))
+    elif im.mode!='L':
+        im = im.convert('L')
+    return np.asarray(im.resize(size,Image.LANCZOS),dtype=float)
+
+def _dctbasis(n=32,k=8):
+    """First k rows of the (unscaled) DCT-II matrix on n points"""
+    return np.cos(np.pi * np.outer(np.arange(k),2 * np.arange(n) + 1) / (2.0 * n))
+
+_DCT8 = _dctbasis()
+
+def _closepairs(hashes,threshold):
+
+    """
+    Index pairs (i, j), i < j, of the distinct 'hashes' within 'threshold'
+    bits, by multi-index hashing (Norouzi et al.). The 64 bits split into m
+    chunks; two hashes within the threshold must be within r bits of each
+    other in at least one chunk, where m * (r + 1) > threshold. So in each
+    chunk, every hash looks up the buckets of all keys within r bits of its
+    own, found through a dense table over the chunk's values, and only those
+    candidates are compared in full. Chunks of about log2(n) bits leave
+    buckets small as n grows; they are at most 22 bits wide, to keep the
+    tables small.
+    """
+
+    n = len(hashes)
+    m = max(3,min(threshold + 1,int(round(64 / np.log2(max(n,2))))))
+    r = -(-(threshold + 1) // m) - 1
+    widths = [64 // m + (1 if j < 64 % m else 0) for j in range(m)]
+    shifts = np.cumsum([0] + widths[:-1])
+
+    found = []
+    for width,shift in zip(widths,shifts):
+        keys = ((hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)).astype(np.int64)
+        counts = np.bincount(keys,minlength=1 << width)
+        starts = np.cumsum(counts) - counts
+        order = np.argsort(keys,kind='stable') # bucket members, bucket by bucket
+
+        for probe in _probes(width,r):
+            probed = keys ^ probe
+            hits = counts[probed]
+            queries = np.repeat(np.arange(n),hits)
+            offsets = _ranks(queries) - 1
+            others = order[np.repeat(starts[probed],hits) + offsets]
+            keep = queries < others # each pair once, and not with itself
+            queries,others = queries[keep],others[keep]
+            close = _popcount(hashes[queries] ^ hashes[others]) <= threshold
+            found.append(queries[close] * n + others[close])
+
+    pairs = np.unique(np.concatenate(found)) # may turn up in several chunks
+    return pairs // n,pairs % n
+
+def _probes(width,r):
+    """Every 'width'-bit mask with at most r bits set"""
+    from itertools import combinations
+    return [sum([1 << bit for bit in bits]) for flips in range(r + 1)
+            for bits in combinations(range(width),flips)]
+
+_BYTECOUNTS = np.array([bin(byte).count('1') for byte in range(256)],dtype=np.uint8)
+
+def _popcount(values):
+    """Set bits in each uint64"""
+    if hasattr(np,'bitwise_count'): # numpy 2
+        return np.bitwise_count(values)
+    return _BYTECOUNTS[values.view(np.uint8)].reshape(-1,8).sum(axis=1)
@@ -0,0 +1,131 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+from six import string_types
+
+from .data import int_types
+
+"""
+An opt-in thumbnail atlas for interactive sessions. Once enabled, every image
+that a plot function decodes at the atlas' thumb size is stored, already
+thumbnailed, in one preallocated array (in memory, or memory-mapped to disk),
+and later plots at that thumb size gather it from there instead of decoding
+the file again. When the array is full, the least recently used thumbnails
+are overwritten.
+"""
+
+ATLAS = None
+
+#------------------------------------------------------------------------------
+
+def use_atlas(thumb=100,maxbytes=2**30,memmap=None):
+
+    """
+    Enables the session thumbnail atlas, replacing any existing one.
+
+    Args:
+        thumb (int,tuple) --- thumbnail size the atlas serves; plots at other
+            sizes decode as usual
+        maxbytes (int) --- memory budget for the atlas
+        memmap (str) --- optional file path; if given, the atlas is a
+            memory-mapped array on disk rather than in RAM
+    """
+
+    global ATLAS
+
+    if not isinstance(thumb,(int_types,tuple)):
+        raise TypeError("'thumb' must be an integer or a tuple")
+    if memmap is not None:
+        if not isinstance(memmap,string_types):
+            raise TypeError("'memmap' must be a filepath string")
+
+    ATLAS = _Atlas(thumb,maxbytes,memmap)
+
+    return ATLAS
+
+def drop_atlas():
+    """Disables the session atlas and frees its memory"""
+
+    global ATLAS
+
+    ATLAS = None
+
+def _atlasfor(thumb):
+    """The active atlas, if it serves this thumb size"""
+    if ATLAS is not None and ATLAS.thumb==thumb:
+        return ATLAS
+
+#------------------------------------------------------------------------------
+
+class _Atlas:
+
+    def __init__(self,thumb,maxbytes,memmap=None):
+        if isinstance(thumb,tuple):
+            tw,th = thumb
+        else:
+            tw,th = thumb,thumb
+
+        self.thumb = thumb
+        self.nslots = max(int(maxbytes // (tw*th*4)),1)
+
+        shape = (self.nslots,th,tw,4)
+        if memmap is None:
+            self.pixels = np.zeros(shape,dtype=np.uint8) # pages committed on use
+        else:
+            self.pixels = np.memmap(memmap,dtype=np.uint8,mode='w+',shape=shape)
+
+        self.sizes = np.zeros((self.nslots,2),dtype=np.int32)
+        self.opaque = np.zeros(self.nslots,dtype=bool)
+        self.slots = OrderedDict() # key -> slot, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __repr__(self):
+        return "<atlas thumb=%s: %d of %d slots, %d hits, %d misses>" % (
+            self.thumb,len(self.slots),self.nslots,self.hits,self.misses)
+
+    def get(self,key):
+        """Returns a new PIL image for 'key', or None if it is not stored"""
+        with self.lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self.slots.move_to_end(key)
+            self.hits += 1
+            w,h = self.sizes[slot]
+            arr = np.array(self.pixels[slot,:h,:w]) # copy, so the slot can be reused
+            opaque = self.opaque[slot]
+
+        im = Image.fromarray(arr,'RGBA')
+        if opaque:
+            im = im.convert('RGB')
+        return im
+
+    def put(self,key,im):
+        """Stores a thumbnailed PIL image under 'key'"""
+        opaque = all([im.mode in ['1','L','P','RGB','CMYK','YCbCr'],
+                      'transparency' not in im.info])
+        arr = np.asarray(im.convert('RGBA'))
+        h,w = arr.shape[:2]
+        if any([h > self.pixels.shape[1],w > self.pixels.shape[2]]):
+            return
+
+        with self.lock:
+            if key in self.slots:
+                slot = self.slots[key]
+                self.slots.move_to_end(key)
+            elif len(self.slots) < self.nslots:
+                slot = len(self.slots)
+                self.slots[key] = slot
+            else:
+                _,slot = self.slots.popitem(last=False) # evict the stalest
+                self.slots[key] = slot
+            self.pixels[slot,:h,:w] = arr
+            self.sizes[slot] = (w,h)
+            self.opaque[slot] = opaque
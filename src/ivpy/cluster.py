@@ -1,9 +1,5 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import AffinityPropagation,AgglomerativeClustering,Birch
-from sklearn.cluster import DBSCAN,KMeans,MiniBatchKMeans
-from sklearn.cluster import MeanShift,SpectralClustering
-import hdbscan
 from six import string_types
 from .plot import show
 from .data import _typecheck,_pathfilter,_featfilter,int_types,seq_types
@@ -94,9 +90,28 @@ Not really any way to prevent that, but it's unlikely to happen because X will
 often be obtained using extract(), which guards against it.
 """
 
-def cluster(X,method='kmeans',k=4,centroids=None,**kwargs):
+"""
+A precomputed knn_graph() of X can stand in for the neighbor search of three
+methods: 'spectral' uses its symmetrized connectivity as the affinity matrix,
+'hdbscan' its symmetrized distances as a sparse precomputed metric, and
+'hierarchical' its edges as the connectivity constraint. hdbscan refuses a
+graph in disconnected pieces, so they are joined by edges longer than any in
+the graph: the pieces then only merge at the root of its hierarchy. Its
+'min_samples' (by default 'min_cluster_size') is capped at the graph's k.
+"""
+
+def cluster(X,method='kmeans',k=4,centroids=None,graph=None,**kwargs):
     _typecheck(**locals())
 
+    if graph is not None and method not in ['spectral','hdbscan','hierarchical']:
+        raise ValueError("""'graph' can only be used with methods 'spectral',
+        'hdbscan', and 'hierarchical'""")
+
+    # imported on first use; hdbscan only when asked for, since it's optional
+    from sklearn.cluster import AffinityPropagation,AgglomerativeClustering,Birch
+    from sklearn.cluster import DBSCAN,KMeans,MiniBatchKMeans
+    from sklearn.cluster import MeanShift,SpectralClustering
+
     if method=='kmeans':
         if centroids is not None:
             k = len(centroids)
@@ -112,6 +127,8 @@ def cluster(X,method='kmeans',k=4,centroids=None,**kwargs):
 
     elif method=='hierarchical':
         #print("method:",method,"\nnumber of clusters:",str(k))
+        if graph is not None:
+            kwargs['connectivity'] = graph
         return _cluster(X,
                         AgglomerativeClustering,
                         n_clusters=k,
@@ -138,6 +155,20 @@ def cluster(X,method='kmeans',k=4,centroids=None,**kwargs):
 
     elif method=='hdbscan':
         #print("method:",method)
+        import hdbscan
+        if graph is not None:
+            graph = graph.tocsr()
+            k = int(np.diff(graph.indptr).min())
+            minsamples = kwargs.get('min_samples',kwargs.get('min_cluster_size',5))
+            if 'min_samples' in kwargs and minsamples > k:
+                raise ValueError("""'min_samples' must be at most the graph's %d
+                    neighbors per item""" % k)
+            kwargs['min_samples'] = min(minsamples,k)
+            return _cluster(X,
+                            hdbscan.HDBSCAN,
+                            fitdata=_sparsedistances(graph),
+                            metric='precomputed',
+                            **kwargs)
         return _cluster(X,
                         hdbscan.HDBSCAN,
                         **kwargs)
@@ -163,15 +194,54 @@ def cluster(X,method='kmeans',k=4,centroids=None,**kwargs):
 
     elif method=='spectral':
         #print("method:",method,"\nnumber of clusters:",str(k))
+        if graph is not None:
+            return _cluster(X,
+                            SpectralClustering,
+                            fitdata=_affinity(graph),
+                            n_clusters=k,
+                            affinity='precomputed',
+                            **kwargs)
         return _cluster(X,
                         SpectralClustering,
                         n_clusters=k,
                         **kwargs)
 
-def _cluster(X,func,**kwargs):
-    fitted = func(**kwargs).fit(X)
+def _cluster(X,func,fitdata=None,**kwargs):
+    fitted = func(**kwargs).fit(X if fitdata is None else fitdata)
     return pd.Series(fitted.labels_,index=X.index)
 
+def _affinity(graph):
+    """0/1 kNN connectivity with self-loops, symmetrized, as sklearn does it"""
+    from scipy.sparse import identity
+    connectivity = graph.tocsr().copy()
+    connectivity.data = np.ones_like(connectivity.data)
+    connectivity = connectivity + identity(graph.shape[0],format='csr')
+    return 0.5 * (connectivity + connectivity.T)
+
+def _sparsedistances(graph):
+
+    """
+    hdbscan's sparse precomputed input from a knn_graph(): symmetrized, with
+    zero distances (duplicates) made tiny, since hdbscan drops zeros as
+    missing, and with its components chained by longer edges.
+    """
+
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+    graph = graph.copy()
+    graph.data[graph.data==0] = np.finfo(graph.dtype).tiny # before maximum() drops them
+    distances = graph.maximum(graph.T).tocsr()
+    ncomponents,labels = connected_components(distances,directed=False)
+    if ncomponents==1:
+        return distances
+    firsts = np.unique(labels,return_index=True)[1] # one item per component
+    bridge = 2 * distances.data.max(initial=0) + 1
+    rows = np.concatenate([firsts[:-1],firsts[1:]])
+    cols = np.concatenate([firsts[1:],firsts[:-1]])
+    bridges = csr_matrix((np.full(len(rows),bridge,dtype=distances.dtype),
+                          (rows,cols)),shape=distances.shape)
+    return (distances + bridges).tocsr()
+
 #------------------------------------------------------------------------------
 
 def _reassign_i(item,reassignment,clustercol):
@@ -1,9 +1,10 @@
 import pandas as pd
 import numpy as np
-import copy
 from PIL import Image
 from six import string_types
 
+from .timing import _timed
+
 ATTACHED_DATAFRAME = None
 ATTACHED_PATHCOL = None
 
@@ -78,6 +79,13 @@ def _typecheck(**kwargs):
     xbins = kwargs.get('xbins') # needs to be None sometimes
     ybins = kwargs.get('ybins') # needs to be None sometimes
     savedir = kwargs.get('savedir',None)
+    savepath = kwargs.get('savepath',None)
+    workers = kwargs.get('workers')
+    cull = kwargs.get('cull')
+    decimate = kwargs.get('decimate')
+    pagesize = kwargs.get('pagesize')
+    offset = kwargs.get('offset',0)
+    graph = kwargs.get('graph')
     feature = kwargs.get('feature','brightness')
     aggregate = kwargs.get('aggregate',True)
     scale = kwargs.get('scale',True)
@@ -175,6 +183,28 @@ def _typecheck(**kwargs):
     if savedir is not None:
         if not isinstance(savedir,string_types):
             raise TypeError("'savedir' must be a directory string")
+    if savepath is not None:
+        if not isinstance(savepath,string_types):
+            raise TypeError("'savepath' must be a filepath string")
+    if workers is not None:
+        if not isinstance(workers,int_types) or isinstance(workers,bool):
+            raise TypeError("'workers' must be an integer")
+    if cull is not None:
+        if cull not in ['exact','approx']:
+            raise ValueError("'cull' must be 'exact' or 'approx'")
+    if decimate is not None:
+        if decimate not in ['minmax','lttb']:
+            raise ValueError("'decimate' must be 'minmax' or 'lttb'")
+    if pagesize is not None:
+        if not isinstance(pagesize,int_types) or isinstance(pagesize,bool) or pagesize < 1:
+            raise TypeError("'pagesize' must be a positive integer")
+    if not isinstance(offset,int_types) or isinstance(offset,bool) or offset < 0:
+        raise TypeError("'offset' must be a non-negative integer")
+    if graph is not None:
+        if not hasattr(graph,'tocsr'):
+            raise TypeError("'graph' must be a scipy sparse matrix, as from knn_graph()")
+        if graph.shape!=(len(X),len(X)):
+            raise ValueError("'graph' must be a knn_graph() over the rows of 'X'")
 
     feats = [
     'brightness','saturation','hue','entropy','std','contrast',
@@ -352,6 +382,7 @@ def detach(df):
     ATTACHED_DATAFRAME = None
     ATTACHED_PATHCOL = None
 
+@_timed('colfilter')
 def _colfilter(pathcol,
                xcol=None,
                ycol=None,
@@ -370,17 +401,25 @@ def _colfilter(pathcol,
     facetcol = _featfilter(pathcol,facetcol)
     notecol = _featfilter(pathcol,notecol)
 
-    """Selecting and sorting"""
-    pathcol,xcol,ycol,facetcol,notecol = _dropna(pathcol,xcol,ycol,facetcol,
-                                                 notecol)
-    pathcol,xcol,ycol,facetcol,notecol = _sample(pathcol,xcol,ycol,
-                                                 sample,facetcol,notecol)
-    pathcol,xcol,ycol,facetcol,notecol = _sort(pathcol,xcol,ycol,
-                                               ascending,facetcol,notecol,
-                                               scatter)
-    pathcol,xcol,ycol,facetcol,notecol = _subset(pathcol,xcol,ycol,
-                                                 xdomain,ydomain,facetcol,
-                                                 notecol)
+    if isinstance(pathcol,string_types): # single path in show(); no filtering
+        return pathcol,xcol,ycol,facetcol,notecol
+
+    """
+    Selecting and sorting. Each step below narrows or reorders an array of row
+    positions, working on the raw column values; the Series themselves are
+    indexed only once, at the end, with the final positions.
+    """
+    xvals = None if xcol is None else xcol.to_numpy()
+    yvals = None if ycol is None else ycol.to_numpy()
+
+    positions = _dropna(len(pathcol),xcol,ycol,facetcol)
+    positions = _sample(positions,sample)
+    positions = _sort(positions,xvals,ascending,scatter)
+    positions = _subset(positions,xvals,yvals,xdomain,ydomain)
+
+    pathcol,xcol,ycol,facetcol,notecol = [None if col is None else
+                                          col.iloc[positions] for col in
+                                          [pathcol,xcol,ycol,facetcol,notecol]]
 
     return pathcol,xcol,ycol,facetcol,notecol
 
@@ -394,20 +433,23 @@ def _pathfilter(pathcol):
     DataFrame in the order they appear there. If no DataFrame is attached,
     user must supply 'pathcol', otherwise the function has no image files
     to open and plot.
+
+    The attached column is handed out by reference, not copied. Nothing
+    downstream mutates it: filtering, sorting and faceting all produce new
+    Series, so a copy would only cost memory.
     """
 
     if pathcol is None:
         if ATTACHED_PATHCOL is None:
             raise ValueError("No DataFrame attached; must supply 'pathcol'")
         else:
-            pathcol = copy.deepcopy(ATTACHED_PATHCOL)
+            pathcol = ATTACHED_PATHCOL
     else:
         if isinstance(pathcol, int): # for use in show()
             if ATTACHED_PATHCOL is None:
                 raise ValueError("No DataFrame attached; must supply 'pathcol'")
             else:
-                tmp = copy.deepcopy(ATTACHED_PATHCOL)
-                pathcol = tmp.loc[pathcol]
+                pathcol = ATTACHED_PATHCOL.loc[pathcol]
 
     return pathcol
 
@@ -425,89 +467,52 @@ def _featfilter(pathcol,col):
                 raise TypeError("""No DataFrame attached. Feature variable
                                     must be a pandas Series""")
             else:
-                tmp = copy.deepcopy(ATTACHED_DATAFRAME)
+                # a single column reference, never a copy of the whole frame
                 try:
-                    col = tmp[col] # if col a str or df column labels are ints
+                    col = ATTACHED_DATAFRAME[col] # if col a str or df column labels are ints
                 except:
-                    col = tmp.iloc[:,col] # if col is int and df col labels not
+                    col = ATTACHED_DATAFRAME.iloc[:,col] # if col is int and df col labels not
                 if not col.index.equals(pathcol.index): # too strong criterion?
                     raise ValueError("""Image paths and image features must
                                         have same indices""")
 
     return col
 
-def _dropna(pathcol,xcol,ycol,facetcol,notecol):
+def _dropna(n,xcol,ycol,facetcol):
     """
     At time this function is called, all cols have same indices. We drop any
     rows with null values in each column, except notecol, which is not a
     plotting position column and so isn't strictly necessary.
     """
-    setlist = []
-    if xcol is not None:
-        if np.mean(xcol.isnull()) > 0:
-            xcol = xcol.dropna()
-            setlist.append(set(xcol.index))
-        else:
-            setlist.append(set(xcol.index))
-    if ycol is not None:
-        if np.mean(ycol.isnull()) > 0:
-            ycol = ycol.dropna()
-            setlist.append(set(ycol.index))
-        else:
-            setlist.append(set(ycol.index))
-    if facetcol is not None:
-        if np.mean(facetcol.isnull()) > 0:
-            facetcol = facetcol.dropna()
-            setlist.append(set(facetcol.index))
-        else:
-            setlist.append(set(facetcol.index))
-
-    if len(setlist) > 0:
-        indices = set.intersection(*setlist)
-        ndiff = len(pathcol.index) - len(indices)
-        if ndiff > 0:
-            print("removed " + str(ndiff) + " rows with missing data")
-            pathcol = pathcol.loc[indices]
-            if xcol is not None:
-                xcol = xcol.loc[indices]
-            if ycol is not None:
-                ycol = ycol.loc[indices]
-            if facetcol is not None:
-                facetcol = facetcol.loc[indices]
-            if notecol is not None:
-                notecol = notecol.loc[indices]
+    keep = np.ones(n,dtype=bool)
+    for col in [xcol,ycol,facetcol]:
+        if col is not None:
+            keep &= col.notna().to_numpy()
 
-    return pathcol,xcol,ycol,facetcol,notecol
+    ndiff = n - np.count_nonzero(keep)
+    if ndiff > 0:
+        print("removed " + str(ndiff) + " rows with missing data")
 
-def _sample(pathcol,xcol,ycol,sample,facetcol,notecol):
+    return np.flatnonzero(keep)
+
+def _sample(positions,sample):
 
     """
-    If user supplies a number for 'sample', we sample pathcol and subset
-    feat/ycol to these indices. We do this because later, we might sort
-    by feat/ycol. If so, we will want to then subset pathcol by feat/ycol,
-    and this won't work if pathcol is missing a bunch of the indices after
-    sampling. So we must sample both together.
+    If user supplies a number for 'sample', we sample row positions, so that
+    every column is later subset to the same rows. Sampled rows come back in
+    random order, which is kept unless a later sort reorders them.
     """
     if sample!=False:
-        pathcol = pathcol.sample(n=sample)
-        if xcol is not None:
-            xcol = xcol.loc[pathcol.index]
-        if ycol is not None:
-            ycol = ycol.loc[pathcol.index]
-        if facetcol is not None:
-            facetcol = facetcol.loc[pathcol.index]
-        if notecol is not None:
-            notecol = notecol.loc[pathcol.index]
+        positions = np.random.choice(positions,size=sample,replace=False)
 
-    return pathcol,xcol,ycol,facetcol,notecol
+    return positions
 
-def _sort(pathcol,xcol,ycol,ascending,facetcol,notecol,scatter):
+def _sort(positions,xvals,ascending,scatter):
 
     """
-    If user supplies xcol, we sort xcol and apply to path/ycol.
-    At this point, if xcol is not None, we know it is a pandas Series
-    (either user-supplied or from the attached df). We also know it is
-    the same length as pathcol - even if pathcol got sampled above.
+    If user supplies xcol, we sort by xcol and apply to every other column.
+    The sort is a single stable argsort of the xcol values at the current
+    positions; ties keep their order, in either direction.
 
     Note that for scatterplots, sorting is unnecessary, and in fact, I now
     believe it to be undesired behavior in case you want to control the stacking
@@ -518,64 +523,113 @@ def _sort(pathcol,xcol,ycol,ascending,facetcol,notecol,scatter):
     possible to sort globally by ycol. This is because only histogram and
     scatter have ycol, and for histograms, this sorting happens bin by bin.
     """
-    if xcol is not None:
+    if xvals is not None:
         if scatter==False: # sort only if non-scatter
-            xcol = xcol.sort_values(ascending=ascending)
-        pathcol = pathcol.loc[xcol.index]
-        if ycol is not None: # nb sorting by ycol not possible globally
-            ycol = ycol.loc[xcol.index]
-        if facetcol is not None:
-            facetcol = facetcol.loc[xcol.index]
-        if notecol is not None:
-            notecol = notecol.loc[xcol.index]
+            positions = positions[_argsort(xvals[positions],ascending)]
 
-    return pathcol,xcol,ycol,facetcol,notecol
+    return positions
+
+def _argsort(vals,ascending):
+    """Stable argsort in either direction; ties keep their order"""
+    if ascending:
+        return np.argsort(vals,kind='stable')
+    else:
+        # as pandas does: reversed stable argsort, reversed back
+        order = len(vals) - 1 - np.argsort(vals[::-1],kind='stable')
+        return order[::-1]
 
-def _subset(pathcol,xcol,ycol,xdomain,ydomain,facetcol,notecol):
+def _subset(positions,xvals,yvals,xdomain,ydomain):
     """
     Because this function runs after pathfilter, featfilter, sample and sort,
-    many checks have already taken place. If xcol and ycol are not None, we
-    know they must be pandas Series and not strings.
+    many checks have already taken place. Domain limits become one boolean
+    mask over the current positions, which preserves their order.
     """
 
+    keep = np.ones(len(positions),dtype=bool)
+
     if xdomain is not None:
-        if xcol is None:
+        if xvals is None:
             raise ValueError("""If 'xdomain' is supplied, 'xcol' must be
                                 supplied as well""")
-        xcol = xcol[(xcol>=xdomain[0])&(xcol<=xdomain[1])]
-        pathcol = pathcol.loc[xcol.index]
-        if ycol is not None:
-            ycol = ycol.loc[xcol.index]
-        if facetcol is not None:
-            facetcol = facetcol.loc[xcol.index]
-        if notecol is not None:
-            notecol = notecol.loc[xcol.index]
-    
+        x = xvals[positions]
+        keep &= (x>=xdomain[0])&(x<=xdomain[1])
+
     if ydomain is not None:
-        if ycol is None:
+        if yvals is None:
             raise ValueError("""If 'ydomain' is supplied, 'ycol' must be
                                 supplied as well""")
+        y = yvals[positions]
+        keep &= (y>=ydomain[0])&(y<=ydomain[1])
 
-        ycol = ycol[(ycol>=ydomain[0])&(ycol<=ydomain[1])]
-        pathcol = pathcol.loc[ycol.index]
-        xcol = xcol.loc[ycol.index] # if ycol is not None, ditto xcol
-        if facetcol is not None:
-            facetcol = facetcol.loc[ycol.index]
-        if notecol is not None:
-            notecol = notecol.loc[ycol.index]
-
-    return pathcol,xcol,ycol,facetcol,notecol
+    return positions[keep]
 
 def _bin(col,bins):
-    colname = col.name
-    col = pd.cut(col,bins)
-    leftbinedges = [float(str(item).split(",")[0].lstrip("([")) for item in col]
+    """
+    Replaces each value with the left edge of its bin. As with pd.cut, bins
+    are closed on the right, and values outside the edges become NaN.
+    """
+    binedges = _binedges(col,bins)
+    xbin = _binindex(col,binedges,include_lowest=False)
+    binedges = _roundedges(binedges)
+    leftbinedges = np.where(xbin >= 0,binedges[np.maximum(xbin,0)],np.nan)
 
     # we set `name` here bc needed for axis titles, original col.name lost otherwise
-    return pd.Series(leftbinedges,index=col.index,name=colname)
+    return pd.Series(leftbinedges,index=col.index,name=col.name)
 
+def _binedges(col,bins,domain=None):
+    """
+    Explicit bin edges. An integer 'bins' splits 'domain', if given, into
+    equal-width bins, and otherwise the data range, widened the way pd.cut
+    widens it so that the minimum falls inside the first bin.
+    """
+    if isinstance(bins,int_types):
+        if domain is not None:
+            return np.linspace(domain[0],domain[1],bins+1)
+        dmin,dmax = col.min(),col.max()
+        if dmin==dmax:
+            adj = 0.001 * abs(dmin) if dmin!=0 else 0.001
+            return np.linspace(dmin-adj,dmax+adj,bins+1)
+        binedges = np.linspace(dmin,dmax,bins+1)
+        binedges[0] -= (dmax - dmin) * 0.001
+        return binedges
+    return np.asarray(bins,dtype=float)
+
+def _roundedges(binedges,precision=3):
+    """
+    Edges rounded as pd.cut rounds them for its interval labels: to 'precision'
+    significant digits after the point, more if needed to keep them distinct.
+    """
+    def roundfrac(x,precision):
+        if not np.isfinite(x) or x==0:
+            return x
+        frac,whole = np.modf(x)
+        if whole==0:
+            digits = -int(np.floor(np.log10(abs(frac)))) - 1 + precision
+        else:
+            digits = precision
+        return np.around(x,digits)
+
+    for p in range(precision,20):
+        rounded = np.array([roundfrac(edge,p) for edge in binedges])
+        if len(np.unique(rounded))==len(binedges):
+            return rounded
+    return binedges
+
+def _binindex(col,binedges,include_lowest=True):
+    """
+    Bin number of every value, found with one np.searchsorted: bins are
+    closed on the right, (a,b], and with 'include_lowest' the first bin also
+    takes its left edge. Values outside the edges (and NaN) get -1.
+    """
+    vals = np.asarray(col,dtype=float)
+    xbin = np.searchsorted(binedges,vals,side='left') - 1
+    if include_lowest:
+        xbin[vals==binedges[0]] = 0
+    xbin[(xbin >= len(binedges) - 1) | np.isnan(vals)] = -1
+    return xbin
+
+@_timed('facet')
 def _facet(**kwargs):
-    kwargdict = copy.deepcopy(kwargs)
     facetcol = kwargs.get('facetcol')
     pathcol = kwargs.get('pathcol')
     xcol = kwargs.get('xcol')
@@ -600,57 +654,54 @@ def _facet(**kwargs):
         if ydomain is None:
             ydomain = (ycol.min(),ycol.max())
 
-    facetlist = []
-    vcounts = facetcol.value_counts()
-    
-    binmax = None
-    
-    #for val in np.sort(facetcol.unique()): # incl NaN but NaNs probably removed
-    for val in vcounts.index:
-        tmp = copy.deepcopy(kwargdict)
+    """
+    Facets are found in a single groupby pass, as arrays of row positions, and
+    the columns are sliced with them. The other kwargs are shared by reference
+    (shallow copies of the dict), since the plotting functions never mutate
+    them.
+    """
 
-        try:
-            del tmp['plottype']
-        except:
-            pass
+    kwargdict = {k:v for k,v in kwargs.items() if k!='plottype'}
+    kwargdict['xdomain'] = xdomain # this bit fixes plot axes across facets
+    kwargdict['ydomain'] = ydomain
 
-        tmp['facettitle'] = str(val)
+    positions = facetcol.groupby(facetcol,sort=False,observed=True).indices
+    vals = facetcol.value_counts().index # largest facets first
+    vals = vals[vals.isin(positions)] # unused categories have no rows
 
-        # this bit fixes plot axes across facets
-        tmp['xdomain'] = xdomain
-        tmp['ydomain'] = ydomain
+    facetlist = []
+    for val in vals:
+        pos = positions[val]
+        tmp = dict(kwargdict)
+        tmp['facettitle'] = str(val)
 
         # generate facet
-        facetedcol = facetcol[facetcol==val]
-        tmp['pathcol'] = pathcol.loc[facetedcol.index]
-
+        tmp['pathcol'] = pathcol.iloc[pos]
         if xcol is not None:
-            tmp['xcol'] = xcol.loc[facetedcol.index]
+            tmp['xcol'] = xcol.iloc[pos]
         if ycol is not None:
-            tmp['ycol'] = ycol.loc[facetedcol.index]
+            tmp['ycol'] = ycol.iloc[pos]
         if notecol is not None:
-            tmp['notecol'] = notecol.loc[facetedcol.index]
-
-        ###---------- Getting binmax for polar histogram
-        if plottype=='histogram':
-            if xdomain is not None:
-                if isinstance(bins,int):
-                    xbin = pd.cut(tmp['xcol'],np.linspace(xdomain[0],xdomain[1],bins+1),labels=False,include_lowest=True)
-            else:
-                xbin = pd.cut(tmp['xcol'],bins,labels=False,include_lowest=True)
-
-            nonemptybins = xbin.unique() # will ignore empty bins
-            facet_binmax = xbin.value_counts().max()
-            if binmax is None:
-                binmax = facet_binmax
-            elif binmax is not None:
-                if facet_binmax > binmax:
-                    binmax = facet_binmax
-
-        ###----------
+            tmp['notecol'] = notecol.iloc[pos]
 
         facetlist.append(tmp)
 
+    ###---------- Getting binmax, the largest bin in any facet, in one pass
+    binmax = None
+    if plottype=='histogram':
+        binedges = _binedges(xcol,bins,xdomain)
+        xbin = _binindex(xcol,binedges)
+
+        facetcodes = np.empty(len(facetcol),dtype=np.int64)
+        for code,val in enumerate(vals):
+            facetcodes[positions[val]] = code
+
+        valid = xbin >= 0
+        nbins = len(binedges) - 1
+        cells = facetcodes[valid] * nbins + xbin[valid]
+        binmax = np.bincount(cells).max()
+    ###----------
+
     return facetlist,binmax
 
 def check_nan(cell):
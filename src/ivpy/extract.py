@@ -5,33 +5,16 @@ from PIL import Image
 from six import string_types
 from math import ceil
 
-from skimage.io import imread,imsave
-from skimage.filters import gaussian
-from skimage import color
-from skimage.draw import disk
-from skimage.util import img_as_ubyte
-from skimage.transform import resize
-from scipy.stats import entropy
-from scipy.stats import percentileofscore as pct
-from sklearn.neighbors import KernelDensity
-
-from skimage.feature import graycomatrix, graycoprops
-
-try:
-    import tifffile as tiff
-    import cv2
-except:
-    print("for roughness extraction, must install `opencv-python` and `tifffile` modules")
-
-try:
-    import torch
-    import torchvision.transforms as transforms
-    from torchvision.models import resnet50, ResNet50_Weights
-except:
-    print("for neural feature extraction, must install `torch` and `torchvision` modules")
+"""
+scikit-image, scipy, scikit-learn, and the optional backends (opencv and
+tifffile for roughness, torch and torchvision for neural features) are
+imported inside the functions that use them, so importing this module, or
+using features that don't need them, doesn't pay for loading them.
+"""
 
 from .data import _typecheck,_pathfilter
 from .plottools import _progressBar
+from .fetch import _localize
 
 #------------------------------------------------------------------------------
 
@@ -39,6 +22,7 @@ def extract(feature,
             pathcol=None,aggregate=True,scale=True,verbose=False,**kwargs):
     _typecheck(**locals())
     pathcol = _pathfilter(pathcol)
+    pathcol = _localize(pathcol) # remote images fetched once, concurrently
 
     if feature=='brightness':
         return _brightness(pathcol,aggregate,scale,verbose)
@@ -119,6 +103,9 @@ def _iterextract(pathcol,cols,breaks,pct,func,verbose=False,**kwargs):
 
 def _imgprocess(imgpath,scale):
     """Returns (possibly scaled) HSV array"""
+    from skimage.io import imread
+    from skimage import color
+
     img = imread(imgpath)
     if scale==True:
         img = _scale(img)
@@ -133,6 +120,7 @@ def _scale(img,side=256):
     """Scales images to  'side' pixels max side for feature extraction. This
        function is distinct from resize() in data.py and does not save any
        images to file."""
+    from skimage.transform import resize
 
     h,w = img.shape[0],img.shape[1] # note weird order
     if any([h>side,w>side]):
@@ -176,6 +164,8 @@ def _featscale(ser, input_range, output_range):
     return ser_adj
 
 def _pct(ser):
+    from scipy.stats import percentileofscore as pct
+
     ser_notnull = ser[ser.notnull()]
     ser = ser.map(lambda x: pct(ser_notnull,x)/100) # pct returns 0-100
 
@@ -289,6 +279,8 @@ def _hue(pathcol,aggregate,scale,verbose):
             return featdf
 
 def _huepeak(imgpath,scale):
+    from sklearn.neighbors import KernelDensity
+
     img = _imgprocess(imgpath,scale)
     imghue = img[:,:,0]
     imghue = imghue.flatten()
@@ -338,6 +330,8 @@ def _entropy_brightness(pathcol,scale,verbose):
                             scale=scale,axis=2)
 
 def _entropy(imgpath,scale,axis=None):
+    from scipy.stats import entropy
+
     img = _imgprocess(imgpath,scale)
     return entropy(np.histogram(img[:,:,axis],bins=10)[0])
 
@@ -373,6 +367,11 @@ def _glcm(pathcol,scale,verbose,prop):
 
 def _graycoprops(imgpath, scale, prop):
     """Note that _imgprocess is not used; here we need gray integer img"""
+    from skimage.io import imread
+    from skimage import color
+    from skimage.util import img_as_ubyte
+    from skimage.feature import graycomatrix, graycoprops
+
     img = imread(imgpath)
     if scale:
         img = _scale(img)
@@ -395,6 +394,13 @@ def _graycoprops(imgpath, scale, prop):
 
 def _neural(pathcol,verbose):
     """Returns ResNet50 penultimate vector"""
+    try:
+        import torch
+        import torchvision.transforms as transforms
+        from torchvision.models import resnet50, ResNet50_Weights
+    except ImportError:
+        raise ImportError("""for neural feature extraction, must install
+                             `torch` and `torchvision` modules""")
 
     device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
     print(f'Using {device} for inference')
@@ -425,6 +431,8 @@ def _neural(pathcol,verbose):
         return featdf
 
 def _featvector(impath,model,preprocess):
+    import torch
+
     if isinstance(impath, string_types):
         im = Image.open(impath)
     else:
@@ -456,7 +464,10 @@ def _condition(pathcol,verbose,k=1,savemap=True,side=512):
                             verbose,k=k,savemap=savemap,side=side)
 
 def _ktop(imgpath,k,savemap,side):
-    
+    from skimage.io import imread,imsave
+    from skimage import color
+    from skimage.util import img_as_ubyte
+
     img = imread(imgpath)
     img_hsv = color.rgb2hsv(img)
 
@@ -569,6 +580,11 @@ def _roughness(pathcol,verbose,
     defined in surface metrology (root mean square height). The roughness values
     computed here have a ~0.9 Pearson correlation with Sq.
     """
+    try:
+        import cv2 # checked once here, rather than failing on every image
+    except ImportError:
+        raise ImportError("""for roughness extraction, must install
+                             `opencv-python` and `tifffile` modules""")
 
     if isinstance(pathcol,string_types):
         return _bandpass_std(pathcol,N,gain,low_pass_sigma,high_pass_sigma,low_pass_apply)
@@ -592,8 +608,11 @@ def _crop_array(array,N):
     return array[int(upper):int(lower),int(left):int(right)]
 
 def _read_process_image(imgpath,gain,N,low_pass_sigma,high_pass_sigma,low_pass_apply):
+    import cv2
+    from skimage import color
 
     try:
+        import tifffile as tiff
         tif_array = tiff.imread(imgpath)
     except:
         tif_array = np.asarray(Image.open(imgpath)) # used if imagecodecs is missing above
@@ -0,0 +1,271 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from six import string_types
+
+from .timing import _timed, _count
+
+"""
+Remote images are fetched through a single pooled requests.Session, several
+at a time, and written to an on-disk cache. A cached response younger than
+FETCH_MAXAGE seconds is used as is; an older one is revalidated with a
+conditional GET (ETag / Last-Modified), so a re-render of the same plot costs
+at most one small 304 per URL rather than a full download.
+
+The cache is capped at FETCH_MAXBYTES: after a batch of downloads, the least
+recently used responses are deleted until it fits again (never those of the
+batch itself). clear_cache() empties it.
+"""
+
+FETCH_TIMEOUT = 10 # seconds, per request
+FETCH_RETRIES = 3
+FETCH_WORKERS = 16
+FETCH_MAXAGE = 3600 # seconds before a cached response is revalidated
+FETCH_CACHEDIR = os.path.join(os.path.expanduser("~"),".ivpy","cache")
+FETCH_MAXBYTES = 2**30 # 1GB
+
+_SESSION = None
+_SESSIONLOCK = threading.Lock()
+
+#------------------------------------------------------------------------------
+
+def fetchconfig(timeout=None,
+                retries=None,
+                workers=None,
+                maxage=None,
+                cachedir=None,
+                maxbytes=None,
+                session=None):
+
+    """
+    Changes settings for fetching remote images. Any argument left as None is
+    unchanged.
+
+    Args:
+        timeout (int,float) --- seconds to wait for a server response
+        retries (int) --- retries on connection errors and 429/5xx responses
+        workers (int) --- number of concurrent downloads
+        maxage (int) --- seconds a cached response is trusted without
+            revalidation; 0 revalidates every time
+        cachedir (str) --- directory for cached responses
+        maxbytes (int) --- size cap of the cache directory; least recently
+            used responses are deleted past it
+        session (requests.Session) --- session to use instead of the default
+    """
+
+    global FETCH_TIMEOUT,FETCH_RETRIES,FETCH_WORKERS,FETCH_MAXAGE
+    global FETCH_CACHEDIR,FETCH_MAXBYTES,_SESSION
+
+    if timeout is not None:
+        FETCH_TIMEOUT = timeout
+    if maxage is not None:
+        FETCH_MAXAGE = maxage
+    if cachedir is not None:
+        FETCH_CACHEDIR = cachedir
+    if maxbytes is not None:
+        FETCH_MAXBYTES = maxbytes
+    if any([retries is not None,workers is not None,session is not None]):
+        if retries is not None:
+            FETCH_RETRIES = retries
+        if workers is not None:
+            FETCH_WORKERS = workers
+        with _SESSIONLOCK:
+            _SESSION = session # None rebuilds lazily with new settings
+
+def _session():
+
+    global _SESSION
+
+    with _SESSIONLOCK:
+        if _SESSION is None:
+            import requests # imported on first fetch, not with ivpy
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(total=FETCH_RETRIES,
+                          backoff_factor=0.5,
+                          status_forcelist=[429,500,502,503,504])
+            adapter = HTTPAdapter(pool_connections=FETCH_WORKERS,
+                                  pool_maxsize=FETCH_WORKERS,
+                                  max_retries=retry)
+            session = requests.Session()
+            session.mount("http://",adapter)
+            session.mount("https://",adapter)
+            _SESSION = session
+
+        return _SESSION
+
+#------------------------------------------------------------------------------
+
+def _isurl(impath):
+    return isinstance(impath,string_types) and impath.startswith(("http://",
+                                                                  "https://"))
+
+def _cachepaths(url):
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    ext = os.path.splitext(url.split('?')[0])[1][:5] # keeps format hints
+    bodypath = os.path.join(FETCH_CACHEDIR,key[:2],key + ext)
+    return bodypath,bodypath + '.json'
+
+@_timed('fetch')
+def _fetch(url):
+
+    """
+    Returns the path of a local copy of 'url', downloading or revalidating it
+    as needed. Raises on HTTP errors so callers can substitute a placeholder.
+    """
+
+    bodypath,metapath = _cachepaths(url)
+
+    headers = {}
+    if os.path.exists(bodypath) and os.path.exists(metapath):
+        try:
+            os.utime(bodypath) # recently used, for eviction
+        except OSError: # evicted by another process meanwhile
+            pass
+        if time.time() - os.path.getmtime(metapath) < FETCH_MAXAGE:
+            _count('fetch.hit')
+            return bodypath
+        with open(metapath) as f:
+            meta = json.load(f)
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    response = _session().get(url,headers=headers,timeout=FETCH_TIMEOUT)
+
+    if response.status_code==304:
+        os.utime(metapath) # fresh again
+        _count('fetch.hit')
+        return bodypath
+
+    response.raise_for_status()
+    _count('fetch.miss')
+
+    os.makedirs(os.path.dirname(bodypath),exist_ok=True)
+    tmp = bodypath + '.%d.%d' % (os.getpid(),threading.get_ident())
+    with open(tmp,'wb') as f:
+        f.write(response.content)
+    os.replace(tmp,bodypath) # atomic, so concurrent readers never see halves
+
+    meta = {'url':url,
+            'etag':response.headers.get('ETag'),
+            'last_modified':response.headers.get('Last-Modified')}
+    with open(tmp,'w') as f:
+        json.dump(meta,f)
+    os.replace(tmp,metapath)
+
+    return bodypath
+
+def _fetchsafe(url):
+    try:
+        return _fetch(url)
+    except Exception as e:
+        return e
+
+def _prefetch(impaths):
+
+    """
+    Fetches every URL among 'impaths' concurrently. Returns a dict mapping
+    each URL to its local path, or to the exception raised while fetching it.
+    """
+
+    urls = list(set([item for item in impaths if _isurl(item)]))
+    if len(urls)==0:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        results = list(pool.map(_fetchsafe,urls))
+
+    _evict(keep=set([item for item in results if isinstance(item,string_types)]))
+
+    return dict(zip(urls,results))
+
+def clear_cache():
+
+    """
+    Deletes every response in the fetch cache (FETCH_CACHEDIR; see
+    fetchconfig()). Remote images are downloaded again on next use.
+    """
+
+    if not os.path.isdir(FETCH_CACHEDIR):
+        return
+    for name in os.listdir(FETCH_CACHEDIR):
+        if _isbucket(name):
+            shutil.rmtree(os.path.join(FETCH_CACHEDIR,name),ignore_errors=True)
+
+def _isbucket(name):
+    """Cache subdirectories are named by the first two hex digits of a key"""
+    return len(name)==2 and all([c in '0123456789abcdef' for c in name])
+
+def _ispartial(name):
+    """A download still being written, named body.pid.threadid"""
+    parts = name.split('.')
+    return len(parts) >= 3 and parts[-1].isdigit() and parts[-2].isdigit()
+
+def _evict(keep):
+
+    """
+    Deletes the least recently used responses (by body mtime, which hits
+    refresh) until the cache fits in FETCH_MAXBYTES. Paths in 'keep' are
+    about to be read, so they stay even if the cache remains over the cap.
+    """
+
+    if not os.path.isdir(FETCH_CACHEDIR):
+        return
+
+    entries = []
+    total = 0
+    for name in os.listdir(FETCH_CACHEDIR):
+        if not _isbucket(name):
+            continue
+        bucket = os.path.join(FETCH_CACHEDIR,name)
+        for item in os.scandir(bucket):
+            try:
+                stat = item.stat()
+            except OSError: # removed by another process meanwhile
+                continue
+            total += stat.st_size
+            if not item.name.endswith('.json') and not _ispartial(item.name):
+                entries.append((stat.st_mtime,item.path))
+
+    if total <= FETCH_MAXBYTES:
+        return
+
+    for _,bodypath in sorted(entries):
+        if bodypath in keep:
+            continue
+        for path in [bodypath,bodypath + '.json']:
+            try:
+                total -= os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                pass
+        if total <= FETCH_MAXBYTES:
+            break
+
+def _localize(pathcol):
+
+    """
+    Replaces URLs in a pathcol (or a single path) with local cached copies.
+    URLs that cannot be fetched are left as they are.
+    """
+
+    if isinstance(pathcol,string_types):
+        fetched = _prefetch([pathcol])
+    else:
+        fetched = _prefetch(pathcol)
+
+    fetched = {k:v for k,v in fetched.items() if not isinstance(v,Exception)}
+    if len(fetched)==0:
+        return pathcol
+
+    if isinstance(pathcol,string_types):
+        return fetched[pathcol]
+    else:
+        return pathcol.map(lambda item: fetched.get(item,item))
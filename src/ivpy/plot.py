@@ -1,19 +1,24 @@
 from PIL import Image,ImageDraw
 from pandas import Series
-from numpy import sqrt,arange,ndarray,mean
+from numpy import sqrt,arange,ndarray,random,asarray,isnan
 from copy import deepcopy
 from six import string_types
 
-from .data import _typecheck,_colfilter,_facet
-from .plottools import _gridcoords,_paste,_getsizes,_round
+from .data import _typecheck,_colfilter,_facet,int_types
+from .plottools import _gridcoords,_paste,_getsizes,_round,_pastecoords
 from .plottools import _border,_montage,_histogram,_scatter,_facetcompose
-from .plottools import _titlesize,_entitle,_bottom_left_corner
+from .plottools import _titlesize,_entitle,_bottom_left_corner,_facetrender
+from .plottools import _setpreview,_decimate,_showpage,_Pager
+from .plottools import _facetbudget,_montagesize,_histsize
+from . import plottools
+from .timing import _timed
 
 seq_types = (list,tuple,ndarray,Series)
 
 #------------------------------------------------------------------------------
 #------------------------------------------------------------------------------
 
+@_timed('show')
 def show(pathcol=None,
          xcol=None,
          notecol=None,
@@ -22,11 +27,14 @@ def show(pathcol=None,
          sample=False,
          idx=False,
          bg='#212121',
-         ascending=False):
+         ascending=False,
+         pagesize=None,
+         offset=0):
 
     """
     Shows either a single image by index or a pathcol, possibly sampled,
-    as a scrolling, sortable rect montage
+    as a scrolling, sortable rect montage. With 'pagesize', returns a pager
+    that renders one page at a time instead of the whole pathcol.
 
     Args:
         pathcol (int,Series) --- single index or col of image paths to be shown
@@ -38,6 +46,9 @@ def show(pathcol=None,
         idx (Boolean) --- whether to print indices on images
         bg (color) --- background color
         ascending (Boolean) --- sorting order
+        pagesize (int) --- number of images per page; if given, returns a
+            pager (see plottools._Pager) with .next(), .prev(), and .goto()
+        offset (int) --- position of the first image on the first page
     """
 
     try:
@@ -64,15 +75,14 @@ def show(pathcol=None,
         else:
             ncols = int(980/thumb) # n.b. Python 3 defaults to float divide
 
-        n = len(pathcol)
-        w,h,coords = _gridcoords(n,ncols,thumb)
-        canvas = Image.new('RGB',(w,h),bg)
-        _paste(pathcol,thumb,idx,canvas,coords,notecol=notecol)
+        if pagesize is not None:
+            return _Pager(pathcol,thumb,ncols,idx,bg,notecol,pagesize,offset)
 
-        return canvas
+        return _showpage(pathcol,thumb,ncols,idx,bg,notecol)
 
 #------------------------------------------------------------------------------
 
+@_timed('montage')
 def montage(pathcol=None,
             xcol=None,
             xdomain=None,
@@ -85,7 +95,9 @@ def montage(pathcol=None,
             facetcol=None,
             notecol=None,
             title=None,
-            border=False):
+            border=False,
+            savepath=None,
+            workers=None):
 
     """
     Square or circular montage of images
@@ -104,6 +116,11 @@ def montage(pathcol=None,
         notecol (str,Series) --- annotation column
         title (str) --- plot title
         border (Boolean) --- whether to border facets
+        savepath (str) --- '.png' or '.tif' file to which a grid montage is
+            rendered one row at a time, without holding the whole canvas in
+            memory; if given, the path is returned instead of a canvas
+        workers (int) --- number of facets rendered at once; defaults to the
+            number of CPUs
     """
 
     try:
@@ -111,6 +128,12 @@ def montage(pathcol=None,
     except:
         _typecheck(**locals())
 
+    if savepath is not None:
+        if facetcol is not None:
+            raise ValueError("Cannot stream a faceted montage to 'savepath'")
+        if title is not None:
+            raise ValueError("Cannot title a montage streamed to 'savepath'")
+
     pathcol,xcol,ycol,facetcol,notecol = _colfilter(pathcol,
                                                xcol=xcol,
                                                xdomain=xdomain,
@@ -124,7 +147,16 @@ def montage(pathcol=None,
 
     elif facetcol is not None:
         facetlist,_ = _facet(**locals())
-        plotlist = [_montage(**facet) for facet in facetlist]
+
+        # one thumb for every facet, so that the composed plot fits
+        def sizes(thumb):
+            return [_montagesize(shape)(len(facet['pathcol']),thumb)
+                    for facet in facetlist]
+        facetthumb = _facetbudget(sizes,thumb,'montage',title=title)
+        for facet in facetlist:
+            facet['thumb'] = facetthumb
+
+        plotlist = _facetrender(_montage,facetlist,workers)
         canvas = _facetcompose(*plotlist,bg=bg,border=border)
 
     if title is not None:
@@ -135,6 +167,7 @@ def montage(pathcol=None,
 
 #------------------------------------------------------------------------------
 
+@_timed('histogram')
 def histogram(xcol,
               xdomain=None,
               pathcol=None,
@@ -156,7 +189,8 @@ def histogram(xcol,
               bincols=1,
               border=False,
               title=None,
-              axislines=False):
+              axislines=False,
+              workers=None):
 
     """
     Cartesian or polar histogram of images
@@ -187,6 +221,8 @@ def histogram(xcol,
         border (Boolean) --- whether to border facets
         title (str) --- plot title
         axislines (Boolean) --- whether to draw axis lines
+        workers (int) --- number of facets rendered at once; defaults to the
+            number of CPUs
     """
 
     try:
@@ -215,7 +251,17 @@ def histogram(xcol,
             raise ValueError("Cannot flip images in a faceted plot")
 
         facetlist,binmax = _facet(**locals(),plottype='histogram')
-        plotlist = [_histogram(**facet,binmax=binmax) for facet in facetlist]
+
+        # facets share binmax and bins, so they are all the same size
+        nbins = bins if isinstance(bins,int_types) else len(bins) - 1
+        size = _histsize(coordinates,nbins,-(-binmax // bincols),bincols)
+        def sizes(thumb):
+            return [size(0,thumb)] * len(facetlist)
+        facetthumb = _facetbudget(sizes,thumb,'histogram',xaxis,title)
+        for facet in facetlist:
+            facet['thumb'] = facetthumb
+
+        plotlist = _facetrender(_histogram,facetlist,workers,binmax=binmax)
         canvas = _facetcompose(*plotlist,border=border,bg=bg)
 
     if title is not None:
@@ -226,6 +272,7 @@ def histogram(xcol,
 
 #------------------------------------------------------------------------------
 
+@_timed('scatter')
 def scatter(xcol,
             ycol,
             pathcol=None,
@@ -246,7 +293,9 @@ def scatter(xcol,
             dot=False,
             border=False,
             title=None,
-            axislines=False):
+            axislines=False,
+            workers=None,
+            cull=None):
 
     """
     Cartesian or polar scatterplot of images
@@ -273,6 +322,12 @@ def scatter(xcol,
         border (Boolean) --- whether to border plots
         title (str) --- plot title
         axislines (Boolean) --- whether to draw axis lines
+        workers (int) --- number of facets rendered at once; defaults to the
+            number of CPUs
+        cull (str) --- skip images that later images will completely cover;
+            'exact' reads image headers and leaves the plot unchanged,
+            'approx' assumes every image fills its thumb square; cartesian
+            coordinates only
     """
 
     try:
@@ -300,7 +355,24 @@ def scatter(xcol,
 
     elif facetcol is not None:
         facetlist,_ = _facet(**locals())
-        plotlist = [_scatter(**facet) for facet in facetlist]
+
+        # facets are all 'side'; it shrinks in proportion with thumb
+        def scaled(thumb,facetthumb):
+            if isinstance(side,int_types):
+                return int(side * facetthumb / thumb)
+            return tuple([int(item * facetthumb / thumb) for item in side])
+        def sizes(facetthumb):
+            facetside = scaled(thumb,facetthumb)
+            if isinstance(facetside,int_types):
+                facetside = (facetside,facetside)
+            return [facetside] * len(facetlist)
+        facetthumb = _facetbudget(sizes,thumb,'scatter',xaxis,title)
+        if facetthumb!=thumb:
+            for facet in facetlist:
+                facet['thumb'] = facetthumb
+                facet['side'] = scaled(thumb,facetthumb)
+
+        plotlist = _facetrender(_scatter,facetlist,workers)
         canvas = _facetcompose(*plotlist,border=border,bg=bg)
 
     if title is not None:
@@ -312,6 +384,70 @@ def scatter(xcol,
 #------------------------------------------------------------------------------
 #------------------------------------------------------------------------------
 
+def progressive(plotfunc,*args,**kwargs):
+
+    """
+    Renders a plot in passes, yielding a canvas after each: first every image
+    as a block of its mean colour, then coarse thumbnails, then the finished
+    plot. Both previews come from one small decode per image, which is kept,
+    so only the first progressive plot of an image pays for it. Stop
+    iterating to abandon a layout without paying for the full render. If the
+    plot samples, all passes use the same sample.
+
+    usage:
+
+    for canvas in progressive(scatter,xcol='foo',ycol='bar'):
+        display(canvas)
+
+    Args:
+        plotfunc (function) --- show, montage, histogram, or scatter
+        *args, **kwargs --- passed to plotfunc
+    """
+
+    state = random.get_state() # so sampling picks the same rows every pass
+
+    for level in [1,2,0]: # 0 is the full render
+        random.set_state(state)
+        _setpreview(level)
+        try:
+            canvas = plotfunc(*args,**kwargs)
+        finally:
+            _setpreview(0)
+        yield canvas
+
+def canvasconfig(maxbytes=False,minthumb=None,action=None):
+
+    """
+    Changes the canvas memory budget. Before rendering, each plot estimates
+    its canvas size from the layout; one that would exceed the budget is
+    shrunk (smaller 'thumb', then sampling, for montage and show) or refused,
+    and a message says what was done. Arguments left out are unchanged.
+    montage(savepath=...) streams to disk and needs no budget.
+
+    Args:
+        maxbytes (int) --- peak canvas memory allowed; None turns budgeting
+            off (default 4GB)
+        minthumb (int) --- smallest 'thumb' to shrink to before sampling
+        action (str) --- 'shrink' to fit the budget, or 'error' to raise
+            MemoryError instead
+    """
+
+    if maxbytes is not False:
+        if maxbytes is not None and not isinstance(maxbytes,int_types):
+            raise TypeError("'maxbytes' must be an integer or None")
+        plottools.CANVAS_MAXBYTES = maxbytes
+    if minthumb is not None:
+        if not isinstance(minthumb,int_types) or minthumb < 1:
+            raise TypeError("'minthumb' must be a positive integer")
+        plottools.CANVAS_MINTHUMB = minthumb
+    if action is not None:
+        if action not in ['shrink','error']:
+            raise ValueError("'action' must be 'shrink' or 'error'")
+        plottools.CANVAS_ACTION = action
+
+#------------------------------------------------------------------------------
+
+@_timed('line')
 def line(*args,**kwargs):
 
     """
@@ -323,6 +459,13 @@ def line(*args,**kwargs):
         bg (color) --- background color
         fill (color or sequence of colors) --- line color
         width (int or sequence of ints) --- line weight
+        ymin (int,float) --- lower end of the y axis; defaults to data minimum
+        ymax (int,float) --- upper end of the y axis; defaults to data maximum
+        decimate (str) --- for sequences more than twice as long as the
+            plot is wide, draw only the vertices that shape the line:
+            'minmax' keeps each pixel column's first, lowest, highest, and
+            last points; 'lttb' keeps one point per column by
+            largest-triangle-three-buckets
     """
 
     try:
@@ -338,8 +481,19 @@ def line(*args,**kwargs):
     width = kwargs.get('width', 1)
     side = kwargs.get('side', 400)
     bg = kwargs.get('bg', '#212121')
-    ymin = kwargs.get('ymin', min([min(item) for item in args]))
-    ymax = kwargs.get('ymax', max([max(item) for item in args]))
+    decimate = kwargs.get('decimate')
+
+    arrays = [asarray(arg,dtype=float) for arg in args]
+    anynull = [isnan(arr).any() for arr in arrays]
+    if any(anynull):
+        raise ValueError("Cannot pass null sequence values to 'line'")
+
+    ymin = kwargs.get('ymin')
+    ymax = kwargs.get('ymax')
+    if ymin is None:
+        ymin = min([arr.min() for arr in arrays])
+    if ymax is None:
+        ymax = max([arr.max() for arr in arrays])
 
     yrange = ymax - ymin
 
@@ -350,21 +504,18 @@ def line(*args,**kwargs):
 
     draw = ImageDraw.Draw(canvas)
 
-    anynull = [mean(Series(arg).notnull())!=1 for arg in args]
-    if any(anynull):
-        raise ValueError("Cannot pass null sequence values to 'line'")
-
     lens = list(set([len(arg) for arg in args]))
     n = lens[0]
     if len(lens) > 1:
         raise ValueError("All sequences passed to 'line' must be the same length")
 
-    for i,arg in enumerate(args):
-        incr = side / (n-1)
-        xs = arange(0,side+incr,incr)
-        xs = [int(item) for item in xs[:n]]
-        ys = [int( (1 - (item-ymin) / yrange ) * side ) for item in arg]
-        coords = zip(xs,ys)
+    incr = side / (n-1)
+    xs = arange(0,side+incr,incr)[:n]
+
+    for i,arr in enumerate(arrays):
+        ys = (1 - (arr-ymin) / yrange) * side
+        keep = _decimate(xs,ys,side,decimate)
+        coords = zip(xs[keep].astype(int).tolist(),ys[keep].astype(int).tolist())
 
         if isinstance(fill,seq_types):
             fcolor = fill[i]
@@ -382,6 +533,7 @@ def line(*args,**kwargs):
 
 #------------------------------------------------------------------------------
 
+@_timed('compose')
 def compose(*args,ncols=None,rounding='down',thumb=None,bg='#212121',rgba=False,border=False):
 
     """
@@ -419,6 +571,7 @@ def compose(*args,ncols=None,rounding='down',thumb=None,bg='#212121',rgba=False,
         thumbarg.thumbnail((thumb,thumb),Image.Resampling.LANCZOS)
 
     w,h,coords = _gridcoords(n,ncols,thumb)
+    coords = _pastecoords(coords)
     
     if bg is None or rgba==True:
         metacanvas = Image.new('RGBA',(w,h),bg)
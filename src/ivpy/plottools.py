@@ -1,18 +1,22 @@
 import pandas as pd
 import os
+import struct
+import zlib
+import threading
 from PIL import Image,ImageDraw,ImageFont,ImageColor
-from numpy import repeat, sqrt, arange, radians, cos, sin, linspace
+from numpy import sqrt, arange, radians, cos, sin, linspace
 import numpy as np
 from math import ceil
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from six import string_types
 from copy import deepcopy
 
-try:
-    import requests
-except:
-    print("'requests' module not installed")
-
-from .data import _bin, _typecheck
+from .data import _bin, _binedges, _binindex, _argsort, _typecheck
+from .fetch import _isurl, _prefetch
+from .atlas import _atlasfor
+from .timing import _timed, _stage, _count
 
 int_types = (int,np.int8,np.int16,np.int32,np.int64,
              np.uint8,np.uint16,np.uint32,np.uint64)
@@ -41,6 +45,321 @@ def _border(im,bg):
 #-------------------------------------------------------------------------------
 #-------------------------------------------------------------------------------
 
+"""
+Canvas memory budget (see plot.canvasconfig). Each plot works out its canvas
+size from the layout before allocating it and before decoding any image; if
+the peak memory would exceed CANVAS_MAXBYTES, the plot is shrunk to fit:
+'thumb' is reduced, down to CANVAS_MINTHUMB, and beyond that, montages and
+show() sample their images. Faceted plots are budgeted as a whole, from the
+composed canvas and every facet held until composition, with one thumb for
+all facets. With CANVAS_ACTION 'error', a MemoryError is raised instead.
+None for CANVAS_MAXBYTES turns budgeting off.
+"""
+
+CANVAS_MAXBYTES = 2**32 # 4GB; about 1.4 gigapixels of RGB
+CANVAS_MINTHUMB = 8
+CANVAS_ACTION = 'shrink'
+
+def _canvasbytes(w,h,copies=1):
+    """
+    Peak memory of an RGB canvas. 'copies' counts the canvases alive at
+    once: a matted or faceted plot is pasted into a second, larger one.
+    """
+    return int(w) * int(h) * 3 * copies
+
+def _budget(pathcol,notecol,thumb,size,copies=1,cansample=True):
+
+    """
+    Fits a plot to the canvas budget before it is rendered. 'size' maps
+    (n,thumb) to the canvas (w,h) the layout would give. Returns thumb,
+    pathcol, and notecol, reduced as needed, and prints what was changed.
+    """
+
+    n = len(pathcol)
+    if any([CANVAS_MAXBYTES is None,not isinstance(thumb,int_types),n==0]):
+        return thumb,pathcol,notecol
+
+    w,h = size(n,thumb)
+    nbytes = _canvasbytes(w,h,copies)
+    if nbytes <= CANVAS_MAXBYTES:
+        return thumb,pathcol,notecol
+
+    estimate = "%d x %d canvas (%s)" % (w,h,_bytesize(nbytes))
+    if CANVAS_ACTION=='error':
+        raise MemoryError("""Plot would need a %s, over the %s budget;
+                             reduce 'thumb' or 'sample', or see canvasconfig()"""
+                          % (estimate,_bytesize(CANVAS_MAXBYTES)))
+
+    newthumb = _budgetthumb(n,thumb,size,copies)
+
+    actions = []
+    if newthumb < thumb:
+        actions.append("'thumb' %d -> %d" % (thumb,newthumb))
+
+    if _canvasbytes(*size(n,newthumb),copies) > CANVAS_MAXBYTES:
+        if not cansample:
+            raise MemoryError("""Plot would need a %s even at thumb %d, over
+                                 the %s budget; see canvasconfig()"""
+                              % (estimate,newthumb,_bytesize(CANVAS_MAXBYTES)))
+        newn = int(n * CANVAS_MAXBYTES / float(_canvasbytes(*size(n,newthumb),copies)))
+        while newn > 1 and _canvasbytes(*size(newn,newthumb),copies) > CANVAS_MAXBYTES:
+            newn = int(newn * 0.99)
+        positions = np.sort(np.random.choice(n,max(newn,1),replace=False))
+        pathcol = pathcol.iloc[positions]
+        if notecol is not None:
+            notecol = notecol.iloc[positions]
+        actions.append("sampled %d of %d images" % (len(positions),n))
+
+    print("Plot would need a %s, over the %s budget: %s" % (
+        estimate,_bytesize(CANVAS_MAXBYTES),", ".join(actions)))
+
+    return newthumb,pathcol,notecol
+
+def _bytesize(nbytes):
+    if nbytes < 1024:
+        return "%d bytes" % nbytes
+    for unit in ['KB','MB','GB']:
+        nbytes /= 1024.0
+        if nbytes < 1024 or unit=='GB':
+            return "%.1f %s" % (nbytes,unit)
+
+def _budgetthumb(n,thumb,size,copies=1):
+    """Largest thumb, down to CANVAS_MINTHUMB, whose canvas fits the budget"""
+    if any([CANVAS_MAXBYTES is None,not isinstance(thumb,int_types)]):
+        return thumb
+    nbytes = _canvasbytes(*size(n,thumb),copies)
+    if nbytes <= CANVAS_MAXBYTES:
+        return thumb
+
+    # canvas sides scale with thumb, so bytes scale with its square
+    newthumb = int(thumb * sqrt(CANVAS_MAXBYTES / float(nbytes)))
+    newthumb = max(min(newthumb,thumb-1),CANVAS_MINTHUMB)
+    while newthumb > CANVAS_MINTHUMB and _canvasbytes(*size(n,newthumb),copies) > CANVAS_MAXBYTES:
+        newthumb -= 1
+
+    return newthumb
+
+def _facetbudget(sizes,thumb,plottype,xaxis=None,title=None):
+
+    """
+    Fits a faceted plot to the canvas budget before any facet is rendered.
+    'sizes' maps thumb to the list of facet canvas sizes. Every facet canvas
+    stays alive until _facetcompose mats them and pastes them into the
+    composed canvas, so the peak is all three together (and a titled copy of
+    the composed canvas). Returns the largest thumb, down to CANVAS_MINTHUMB,
+    that fits, and prints what was changed.
+    """
+
+    if any([CANVAS_MAXBYTES is None,not isinstance(thumb,int_types)]):
+        return thumb
+
+    def peak(thumb):
+        return _facetbytes(sizes(thumb),plottype,xaxis,title)
+
+    nbytes = peak(thumb)
+    if nbytes <= CANVAS_MAXBYTES:
+        return thumb
+
+    _,(w,h) = _composedsize(sizes(thumb),plottype,xaxis)
+    estimate = "%d x %d faceted canvas (%s at peak)" % (w,h,_bytesize(nbytes))
+    if CANVAS_ACTION=='error':
+        raise MemoryError("""Plot would need a %s, over the %s budget;
+                             reduce 'thumb' or 'sample', or see canvasconfig()"""
+                          % (estimate,_bytesize(CANVAS_MAXBYTES)))
+
+    newthumb = int(thumb * sqrt(CANVAS_MAXBYTES / float(nbytes)))
+    newthumb = max(min(newthumb,thumb-1),CANVAS_MINTHUMB)
+    while newthumb > CANVAS_MINTHUMB and peak(newthumb) > CANVAS_MAXBYTES:
+        newthumb -= 1
+    if newthumb >= thumb or peak(newthumb) > CANVAS_MAXBYTES:
+        raise MemoryError("""Plot would need a %s even at thumb %d, over the
+                             %s budget; reduce 'sample', or see canvasconfig()"""
+                          % (estimate,min(newthumb,thumb),_bytesize(CANVAS_MAXBYTES)))
+
+    print("Plot would need a %s, over the %s budget: 'thumb' %d -> %d" % (
+        estimate,_bytesize(CANVAS_MAXBYTES),thumb,newthumb))
+
+    return newthumb
+
+def _facetbytes(sizes,plottype,xaxis=None,title=None):
+    """Peak memory of rendering facets of 'sizes' and composing them"""
+    (cw,ch),(w,h) = _composedsize(sizes,plottype,xaxis)
+    pixels = sum([fw*fh for fw,fh in sizes]) + len(sizes)*cw*ch + w*h
+    if title is not None:
+        pixels += w * (h + 2*_titlefont(max(w,h))[2])
+    return _canvasbytes(pixels,1)
+
+def _composedsize(sizes,plottype,xaxis=None):
+
+    """
+    Matted facet size and composed canvas size that _facetcompose will build
+    from facets of 'sizes': montage facets are padded to squares as big as
+    the largest facet side, histogram facets to the tallest; _facetmat adds
+    axes (two boxes of twice the title font height, on both sides) and the
+    facet title (twice the font height on top), the font sized to the facet.
+    """
+
+    side = max([max(size) for size in sizes])
+    if plottype=='montage':
+        cw,ch = side,side
+    else:
+        cw = max([size[0] for size in sizes])
+        ch = max([size[1] for size in sizes])
+
+    fontHeight = _titlefont(max(cw,ch))[2]
+    if xaxis is not None:
+        cw,ch = cw + fontHeight*4,ch + fontHeight*4
+    ch += fontHeight*2 # every facet is titled
+
+    n = len(sizes)
+    ncols = _round(sqrt(n),direction='down')
+    nrows = int(ceil(float(n) / ncols))
+    return (cw,ch),(ncols*cw,nrows*ch)
+
+def _histsize(coordinates,nbins,binmax,bincols):
+    """Size function for _budget: a histogram whose tallest bin is 'binmax'"""
+    def size(n,thumb):
+        if coordinates=='polar':
+            return binmax*2*thumb+thumb, binmax*2*thumb+thumb
+        elif bincols > 1:
+            return (bincols + 1) * thumb * nbins, thumb * binmax
+        return thumb * nbins, thumb * binmax
+    return size
+
+def _gridsize(ncols):
+    """Size function for _budget: a grid of 'ncols' columns"""
+    def size(n,thumb):
+        return ncols*thumb, int(ceil(float(n)/ncols))*thumb
+    return size
+
+def _montagesize(shape):
+    """Size function for _budget: a montage of the given shape"""
+    def size(n,thumb):
+        if shape=='circle':
+            side = _circleside(n)
+            return side*thumb, side*thumb
+        return _gridsize(_montagecols(n,shape))(n,thumb)
+    return size
+
+def _montagecols(n,shape):
+    if shape=='square':
+        return ceil(sqrt(n))
+    elif shape=='rect':
+        return ceil( sqrt( n / 0.5625 ) )
+    else:
+        return shape # an integer number of columns
+
+def _circleside(n):
+    # Calculate a more adaptive canvas size based on number of images
+    # For very small n, use a smaller minimum size
+    if n <= 10:
+        return max(5, int(sqrt(n)) + 3)
+    # For larger n, use a formula that scales better with image count
+    else:
+        # Calculate radius needed for n points distributed in a circle
+        # Add a buffer to avoid edge clipping
+        return int(sqrt(n) * 1.2) + 2
+
+#-------------------------------------------------------------------------------
+
+def _showpage(pathcol,thumb,ncols,idx,bg,notecol=None):
+    """One show() canvas: 'pathcol' in rows of 'ncols' thumbnails"""
+    thumb,pathcol,notecol = _budget(pathcol,notecol,thumb,_gridsize(ncols))
+
+    w,h,coords = _gridcoords(len(pathcol),ncols,thumb)
+    canvas = Image.new('RGB',(w,h),bg)
+    _paste(pathcol,thumb,idx,canvas,coords,notecol=notecol)
+
+    return canvas
+
+class _Pager:
+
+    """
+    Browses a pathcol one page at a time, as returned by show() with a
+    'pagesize'. Only the page being viewed is rendered; while it is looked
+    at, the next one renders in a background thread, so paging forward is
+    usually instant. Displays as its current page in Jupyter.
+
+    usage:
+
+    pager = show(pagesize=200)
+    pager.next() # or .prev(), .goto(offset); each returns the page canvas
+    for canvas in pager: # every page from here on
+        ...
+    """
+
+    def __init__(self,pathcol,thumb,ncols,idx,bg,notecol,pagesize,offset=0):
+        self.pathcol = pathcol
+        self.notecol = notecol
+        self.thumb = thumb
+        self.ncols = ncols
+        self.idx = idx
+        self.bg = bg
+        self.pagesize = pagesize
+        self.n = len(pathcol)
+        self.offset = min(max(offset,0),max(self.n-1,0))
+        self.pages = {} # page offset -> Future of its canvas
+        self.pool = ThreadPoolExecutor(max_workers=1)
+
+    def __len__(self):
+        return int(ceil(self.n / float(self.pagesize)))
+
+    def __repr__(self):
+        last = min(self.offset + self.pagesize,self.n)
+        return "<pager: items %d-%d of %d, page %d of %d>" % (
+            self.offset,last-1,self.n,self.offset // self.pagesize + 1,len(self))
+
+    def __iter__(self):
+        while True:
+            yield self.canvas
+            if self.offset + self.pagesize >= self.n:
+                return
+            self.offset += self.pagesize
+
+    def _repr_png_(self):
+        return self.canvas._repr_png_()
+
+    @property
+    def canvas(self):
+        """The current page, rendering it if necessary"""
+        canvas = self._page(self.offset).result()
+        ahead = self.offset + self.pagesize
+        if ahead < self.n:
+            self._page(ahead) # starts rendering in the background
+        for start in list(self.pages): # keep only previous, current, and next
+            if abs(start - self.offset) > self.pagesize:
+                self.pages.pop(start).cancel()
+        return canvas
+
+    def next(self):
+        if self.offset + self.pagesize < self.n:
+            self.offset += self.pagesize
+        return self.canvas
+
+    def prev(self):
+        self.offset = max(self.offset - self.pagesize,0)
+        return self.canvas
+
+    def goto(self,offset):
+        """Moves to the page starting at item position 'offset'"""
+        self.offset = min(max(offset,0),max(self.n-1,0))
+        return self.canvas
+
+    def _page(self,start):
+        if start not in self.pages:
+            end = start + self.pagesize
+            pathcol = self.pathcol.iloc[start:end]
+            notecol = None
+            if self.notecol is not None:
+                notecol = self.notecol.iloc[start:end]
+            self.pages[start] = self.pool.submit(_showpage,pathcol,self.thumb,
+                                                 self.ncols,self.idx,self.bg,
+                                                 notecol)
+        return self.pages[start]
+
+#-------------------------------------------------------------------------------
+#-------------------------------------------------------------------------------
+
 """
 The underscored plotting functions take a raft of kwargs, most of which are idle
 because they were used to sort, sample, etc., which determines what the cols
@@ -63,43 +382,38 @@ def _montage(pathcol=None,
              facettitle=None,
              notecol=None,
              border=None,
-             title=None):
+             title=None,
+             savepath=None,
+             workers=None):
 
     n = len(pathcol)
 
-    if shape=='square':
-        ncols = ceil(sqrt(n))
-        w,h,coords = _gridcoords(n,ncols,thumb)
-        canvas = Image.new('RGB',(w,h),bg)
-        _paste(pathcol,thumb,idx,canvas,coords,notecol=notecol)
-    elif shape=='rect':
-        ncols = ceil( sqrt( n / 0.5625 ) )
+    if savepath is not None: # only one band in memory, so no budget needed
+        if shape=='circle':
+            raise ValueError("Cannot stream a circular montage to 'savepath'")
+        ncols = _montagecols(n,shape)
+        return _montagestream(pathcol,ncols,thumb,idx,bg,notecol,savepath)
+
+    copies = 2 if any([facetcol is not None,title is not None]) else 1
+    thumb,pathcol,notecol = _budget(pathcol,notecol,thumb,_montagesize(shape),
+                                    copies)
+    n = len(pathcol)
+
+    if shape in ['square','rect']:
+        ncols = _montagecols(n,shape)
         w,h,coords = _gridcoords(n,ncols,thumb)
         canvas = Image.new('RGB',(w,h),bg)
         _paste(pathcol,thumb,idx,canvas,coords,notecol=notecol)
     elif shape=='circle':
-        # Calculate a more adaptive canvas size based on number of images
-        # For very small n, use a smaller minimum size
-        if n <= 10:
-            side = max(5, int(sqrt(n)) + 3)
-        # For larger n, use a formula that scales better with image count
-        else:
-            # Calculate radius needed for n points distributed in a circle
-            # Add a buffer to avoid edge clipping
-            side = int(sqrt(n) * 1.2) + 2
-        
+        side = _circleside(n)
+
         # Create square canvas to fit the circle
         canvas_size = side * thumb
         canvas = Image.new('RGB',(canvas_size, canvas_size),bg)
 
-        # center image
-        gridlist,maximus,coords = _gridcoordscirclemax(side,thumb)
-        _paste(pathcol[:1],thumb,idx,canvas,coords,notecol=notecol)
-        gridlist.remove(maximus)
-
-        # remaining images
-        coords = _gridcoordscircle(n,maximus,gridlist,thumb)
-        _paste(pathcol[1:],thumb,idx,canvas,coords,notecol=notecol)
+        # first image at the center, the rest spiralling outward
+        coords = _gridcoordscircle(n,side,thumb)
+        _paste(pathcol,thumb,idx,canvas,coords,notecol=notecol)
     else:
         # if shape is none of the above, it will be an integer number of columns
         w,h,coords = _gridcoords(n,shape,thumb)
@@ -116,6 +430,161 @@ def _montage(pathcol=None,
 
         return canvas,matdict
 
+def _montagestream(pathcol,ncols,thumb,idx,bg,notecol,savepath):
+
+    """
+    Renders a grid montage one row band at a time and appends each band to an
+    image file on disk, so that only a single band (ncols * thumb wide, thumb
+    high) is ever held in memory. The file format follows the extension of
+    'savepath': PNG or (uncompressed, baseline) TIFF.
+    """
+
+    n = len(pathcol)
+    nrows = int( ceil( float(n) / ncols ) )
+    w,h = ncols*thumb,nrows*thumb
+
+    ext = os.path.splitext(savepath)[1].lower()
+    if ext=='.png':
+        writer = _PNGStripWriter(savepath,w,h)
+    elif ext in ['.tif','.tiff']:
+        writer = _TIFFStripWriter(savepath,w,h,thumb)
+    else:
+        raise ValueError("'savepath' must end in '.png', '.tif', or '.tiff'")
+
+    try:
+        for row in range(nrows):
+            rowslice = slice(row*ncols,(row+1)*ncols)
+            pathcol_row = pathcol.iloc[rowslice]
+            notecol_row = None if notecol is None else notecol.iloc[rowslice]
+            _,_,coords = _gridcoords(len(pathcol_row),ncols,thumb)
+            band = Image.new('RGB',(w,thumb),bg)
+            _paste(pathcol_row,thumb,idx,band,coords,notecol=notecol_row)
+            writer.write(band)
+    except BaseException: # including KeyboardInterrupt
+        writer.abort()
+        raise
+    writer.close()
+
+    return savepath
+
+class _StripWriter:
+
+    """
+    Base for the strip writers. They write to 'path.part' and only rename it
+    to 'path' once the file is complete, so a render that fails or is
+    interrupted leaves no truncated image behind (nor clobbers an old one).
+    """
+
+    def __init__(self,path):
+        self.path = path
+        self.partpath = path + '.part'
+        self.f = open(self.partpath,'wb')
+
+    def _commit(self):
+        self.f.close()
+        os.replace(self.partpath,self.path)
+
+    def abort(self):
+        self.f.close()
+        os.remove(self.partpath)
+
+class _PNGStripWriter(_StripWriter):
+
+    """Writes an 8-bit RGB PNG incrementally, one band of rows at a time"""
+
+    def __init__(self,path,w,h):
+        _StripWriter.__init__(self,path)
+        self.z = zlib.compressobj(6)
+        self.f.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR',struct.pack('>IIBBBBB',w,h,8,2,0,0,0))
+
+    def _chunk(self,tag,data):
+        self.f.write(struct.pack('>I',len(data)))
+        self.f.write(tag)
+        self.f.write(data)
+        self.f.write(struct.pack('>I',zlib.crc32(tag+data) & 0xffffffff))
+
+    def write(self,band):
+        arr = np.asarray(band.convert('RGB'),dtype=np.uint8)
+        rows = arr.reshape(arr.shape[0],-1)
+        filterbytes = np.zeros((arr.shape[0],1),dtype=np.uint8) # filter type 0
+        data = self.z.compress(np.hstack([filterbytes,rows]).tobytes())
+        if data:
+            self._chunk(b'IDAT',data)
+
+    def close(self):
+        self._chunk(b'IDAT',self.z.flush())
+        self._chunk(b'IEND',b'')
+        self._commit()
+
+class _TIFFStripWriter(_StripWriter):
+
+    """
+    Writes an uncompressed 8-bit RGB TIFF incrementally. Each band becomes one
+    strip; the image file directory is written at the end, once all strip
+    offsets are known. Classic TIFF is limited to 4GB.
+    """
+
+    def __init__(self,path,w,h,rowsperstrip):
+        if w * h * 3 > 2**32 - 2**20:
+            raise ValueError("Image too large for a classic TIFF; use '.png'")
+        _StripWriter.__init__(self,path)
+        self.w,self.h,self.rowsperstrip = w,h,rowsperstrip
+        self.offsets = []
+        self.counts = []
+        self.f.write(b'II*\x00' + struct.pack('<I',0)) # IFD offset patched later
+
+    def write(self,band):
+        data = np.asarray(band.convert('RGB'),dtype=np.uint8).tobytes()
+        self.offsets.append(self.f.tell())
+        self.counts.append(len(data))
+        self.f.write(data)
+
+    def _array(self,fmt,values):
+        """Writes out-of-line tag values; returns their offset"""
+        if self.f.tell() % 2:
+            self.f.write(b'\x00') # TIFF offsets must be word-aligned
+        offset = self.f.tell()
+        self.f.write(struct.pack('<%d%s' % (len(values),fmt),*values))
+        return offset
+
+    def close(self):
+        SHORT,LONG = 3,4
+        nstrips = len(self.offsets)
+        bitsoffset = self._array('H',[8,8,8])
+        if nstrips > 1:
+            offsetsvalue = self._array('I',self.offsets)
+            countsvalue = self._array('I',self.counts)
+        else:
+            offsetsvalue = self.offsets[0]
+            countsvalue = self.counts[0]
+
+        tags = [(256,LONG,1,self.w),
+                (257,LONG,1,self.h),
+                (258,SHORT,3,bitsoffset),
+                (259,SHORT,1,1), # no compression
+                (262,SHORT,1,2), # RGB
+                (273,LONG,nstrips,offsetsvalue),
+                (277,SHORT,1,3),
+                (278,LONG,1,self.rowsperstrip),
+                (279,LONG,nstrips,countsvalue),
+                (284,SHORT,1,1)] # chunky
+
+        if self.f.tell() % 2:
+            self.f.write(b'\x00')
+        ifdoffset = self.f.tell()
+        self.f.write(struct.pack('<H',len(tags)))
+        for tag,fieldtype,count,value in tags:
+            if fieldtype==SHORT and count==1:
+                self.f.write(struct.pack('<HHIHH',tag,fieldtype,count,value,0))
+            else:
+                self.f.write(struct.pack('<HHII',tag,fieldtype,count,value))
+        self.f.write(struct.pack('<I',0)) # no further IFDs
+
+        self.f.seek(4)
+        self.f.write(struct.pack('<I',ifdoffset))
+        self._commit()
+
 #-------------------------------------------------------------------------------
 
 def _histogram(xcol=None,
@@ -141,7 +610,8 @@ def _histogram(xcol=None,
                border=None,
                binmax=None,
                title=None,
-               axislines=None):
+               axislines=None,
+               workers=None):
 
     """
     If user submitted bin sequence leaves out some rows, user must pass xdomain
@@ -165,16 +635,30 @@ def _histogram(xcol=None,
     possible, for example, to restrict the domain using 'xdomain' and expand the
     plotting space using 'bins'.
     """
-    if xdomain is not None:
-        if isinstance(bins,int):
-            xbin = pd.cut(xcol,linspace(xdomain[0],xdomain[1],bins+1),labels=False,include_lowest=True)
-    else:
-        xbin = pd.cut(xcol,bins,labels=False,include_lowest=True)
+    binedges = _binedges(xcol,bins,xdomain)
+    xbin = _binindex(xcol,binedges)
 
-    nonemptybins = xbin.unique() # will ignore empty bins
+    """
+    Bin membership for every row at once: one stable sort groups row positions
+    by bin (after ordering by ycol, if given, so each bin comes out sorted),
+    and the groups are split at the bin boundaries. Bins are then visited in
+    order of first appearance, which fixes the paste order.
+    """
+    inbins = np.flatnonzero(xbin >= 0)
+    if ycol is not None:
+        order = _argsort(ycol.to_numpy()[inbins],ascending)
+    else:
+        order = np.arange(len(inbins))
+    order = order[np.argsort(xbin[inbins][order],kind='stable')]
+    members = inbins[order]
+    sortedbins = xbin[members]
+    starts = np.flatnonzero(np.diff(sortedbins,prepend=-1))
+    bingroups = np.split(members,starts[1:])
+    binlabels = sortedbins[starts]
+    firstseen = np.argsort([group.min() for group in bingroups],kind='stable')
 
     if binmax is None:
-        binmax = xbin.value_counts().max()
+        binmax = np.bincount(xbin[inbins]).max()
 
     if isinstance(bins,int):
         nbins = bins
@@ -183,9 +667,12 @@ def _histogram(xcol=None,
 
     if bincols > 1:
         binmax = ceil(binmax / bincols)
-        plotwidth = (bincols + 1) * thumb * nbins
-    else:
-        plotwidth = thumb * nbins
+
+    size = _histsize(coordinates,nbins,binmax,bincols)
+
+    thumb,_,_ = _budget(pathcol,None,thumb,size,copies=2,cansample=False)
+
+    plotwidth = size(len(pathcol),thumb)[0]
 
     if coordinates=='cartesian':
         plotheight = thumb * binmax
@@ -195,13 +682,9 @@ def _histogram(xcol=None,
             raise ValueError("If 'flip' is true, 'coordinates' must be 'cartesian'")
         canvas = Image.new('RGB',(binmax*2*thumb+thumb,binmax*2*thumb+thumb),bg)
 
-    for binlabel in nonemptybins:
-        if ycol is not None:
-            ycol_bin = ycol[xbin==binlabel]
-            ycol_bin = ycol_bin.sort_values(ascending=ascending)
-            pathcol_bin = pathcol.loc[ycol_bin.index]
-        elif ycol is None:
-            pathcol_bin = pathcol[xbin==binlabel]
+    for j in firstseen:
+        binlabel = int(binlabels[j])
+        pathcol_bin = pathcol.iloc[bingroups[j]]
 
         n = len(pathcol_bin)
 
@@ -272,7 +755,9 @@ def _scatter(xcol=None,
              dot=None,
              border=None,
              title=None,
-             axislines=None):
+             axislines=None,
+             workers=None,
+             cull=None):
 
     if xbins is not None:
         xcol = _bin(xcol,xbins)
@@ -290,11 +775,14 @@ def _scatter(xcol=None,
     # xdomain and ydomain only active at this stage if expanding
     if coordinates=='cartesian':
         x,y = _scalecart(xcol,ycol,xdomain,ydomain,side,thumb)
-        coords = list(zip(x,y)) # py3 zip
+        coords = np.column_stack((x,y))
+        if cull is not None:
+            visible = ~_occluded(pathcol,coords,thumb,side,dot,cull)
+            pathcol,coords = pathcol[visible],coords[visible]
         _paste(pathcol,thumb,idx,canvas,coords,coordinates,notecol=notecol,dot=dot)
     elif coordinates=='polar':
         x,y,phis = _scalepol(xcol,ycol,xdomain,ydomain,side,thumb)
-        coords = list(zip(x,y)) # py3 zip
+        coords = np.column_stack((x,y))
         _paste(pathcol,thumb,idx,canvas,coords,coordinates,phis,notecol=notecol,dot=dot)
 
     if facetcol is None:
@@ -322,6 +810,111 @@ def _scatter(xcol=None,
 
 #-------------------------------------------------------------------------------
 
+def _occluded(pathcol,coords,thumb,side,dot=None,cull='exact'):
+
+    """
+    Marks the items of a cartesian scatterplot that will be completely hidden
+    by items pasted after them, so they need not be decoded at all.
+
+    Walking backwards through paste order, we keep a pixel mask of what is
+    already covered. An item is hidden if every pixel it could possibly occupy
+    (its 'outer' box) is covered; if not, the pixels it is certain to occupy
+    (its 'inner' box) are added to the mask. In 'exact' mode the boxes come
+    from image headers (a lazy Image.open, no decoding): the outer box is the
+    largest thumbnail the image could produce, the inner box the smallest,
+    and images with any transparency never cover anything, so the final
+    canvas is identical. In 'approx' mode every item is taken to fill its
+    whole thumb x thumb cell, which needs no file access at all.
+    """
+
+    if isinstance(thumb,tuple):
+        tw,th = thumb
+    else:
+        tw,th = thumb,thumb
+
+    n = len(coords)
+    outer = np.tile([tw,th],(n,1)) # (w,h) of each box, offset from coords
+    inner = np.tile([tw,th],(n,1))
+    inset = np.zeros((n,2),dtype=int) # offset of the inner box
+
+    if dot==True:
+        dside = max(tw,th)
+        incr = int( dside / 10 )
+        radius = int( dside / 20 )
+        outer[:] = dside - incr + 1 # rounded rectangle includes its end pixel
+        inset[:] = incr + radius # corners are rounded, so stay inside them
+        inner[:] = max(dside - incr - radius - inset[0,0],0)
+        outerinset = incr
+    else:
+        outerinset = 0
+        if cull=='exact':
+            fetched = _prefetch(pathcol)
+            for j,impath in enumerate(pathcol):
+                outer[j],inner[j] = _footprint(fetched.get(impath,impath),tw,th)
+
+    covered = np.zeros((side[1],side[0]),dtype=bool)
+    hidden = np.zeros(n,dtype=bool)
+    for j in range(n-1,-1,-1):
+        x,y = coords[j]
+        x0,y0 = max(x+outerinset,0),max(y+outerinset,0)
+        x1,y1 = max(x+outer[j,0],0),max(y+outer[j,1],0)
+        box = covered[y0:y1,x0:x1]
+        if box.size==0 or box.all():
+            hidden[j] = True
+        else:
+            x0,y0 = max(x+inset[j,0],0),max(y+inset[j,1],0)
+            covered[y0:y0+inner[j,1],x0:x0+inner[j,0]] = True
+
+    return hidden
+
+def _footprint(impath,tw,th):
+
+    """
+    Largest and smallest (w,h) an image can occupy once thumbnailed into
+    (tw,th), read from its header. The smallest is zero for images that may
+    be transparent, and for anything that cannot be opened, since those are
+    pasted as placeholders we make no assumptions about.
+    """
+
+    try:
+        if isinstance(impath,Image.Image):
+            im = impath
+        else:
+            im = Image.open(impath) # lazy; reads the header only
+        w,h = im.size
+        opaque = all([im.mode in ['1','L','RGB','CMYK','YCbCr','I','F'],
+                      'transparency' not in im.info])
+    except Exception:
+        return (tw,th),(0,0)
+
+    outer = (min(w,tw),min(h,th))
+    if not opaque:
+        return outer,(0,0)
+
+    scale = min(tw/float(w),th/float(h),1.0)
+    inner = (max(int(w*scale)-1,0),max(int(h*scale)-1,0))
+
+    return outer,inner
+
+def _facetrender(func,facetlist,workers=None,**kwargs):
+
+    """
+    Renders every facet with 'func' on a pool of threads and returns the
+    results in facet order. Threads rather than processes, because the work is
+    dominated by image decoding and resampling, during which PIL releases the
+    GIL, and because the facets and their canvases need not be pickled.
+    """
+
+    if workers is None:
+        workers = min(len(facetlist),os.cpu_count() or 1)
+
+    if workers <= 1:
+        return [func(**facet,**kwargs) for facet in facetlist]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(func,**facet,**kwargs) for facet in facetlist]
+        return [future.result() for future in futures]
+
 def _facetcompose(*args,border=None,bg=None):
 
     # item[0] in each arg is the Image; item[1] is matdict
@@ -362,6 +955,7 @@ def _facetcompose(*args,border=None,bg=None):
     n = len(args)
     ncols = _round(sqrt(n),direction='down')
     w,h,coords = _gridcoords(n,ncols,mattedfacets[0].size) # any facet in the list is fine, all same
+    coords = _pastecoords(coords)
     metacanvas = Image.new('RGB',(w,h),bg)
 
     for i in range(n):
@@ -386,6 +980,7 @@ def _islight(color):
 
     return sum(color) > 382.5
 
+@_timed('facetmat')
 def _facetmat(im,
          bg=None,
          facettitle=None,
@@ -506,8 +1101,11 @@ def _axes(im,xaxis,yaxis,pt,fontHeight,xtitle,ytitle,bg,textcolor,xdomain,ydomai
     return ax
 
 def _titlesize(im):
+    return _titlefont(max(im.size))
 
-    side = max(im.size)
+@lru_cache(maxsize=64)
+def _titlefont(side):
+    """Title font whose 9-letter sample spans a quarter of 'side'"""
     pt = 0
     fontWidth = 0
     while fontWidth < side/4:
@@ -548,6 +1146,11 @@ def label_round(lmax):
         else:
             return 1
 
+"""
+Layout helpers. Each returns coordinates as an (n,2) integer array of upper
+left paste positions; _paste converts rows to tuples only at paste time.
+"""
+
 def _gridcoords(n,ncols,thumb):
     nrows = int( ceil( float(n) / ncols ) ) # final row may be incomplete
 
@@ -560,42 +1163,40 @@ def _gridcoords(n,ncols,thumb):
 
     w,h = ncols*item_width,nrows*item_height
 
-    xgrid = list(range(ncols)) * nrows # bc py3 range returns iterator
-    ygrid = repeat(range(nrows),ncols)
-    xgrid = xgrid[:n]
-    ygrid = ygrid[:n]
-    x = [item*item_width for item in xgrid]
-    y = [item*item_height for item in ygrid]
+    cells = np.arange(n)
+    x = cells % ncols * item_width
+    y = cells // ncols * item_height
 
-    return w,h,list(zip(x,y)) # py3 zip
+    return w,h,np.column_stack((x,y))
 
 def _gridcoordsup(n,ncols,thumb):
     nrows = int( ceil( float(n) / ncols ) ) # final row may be incomplete
     w,h = ncols*thumb,nrows*thumb
 
-    xgrid = list(range(ncols)) * nrows # bc py3 range returns iterator
-    ygrid = repeat(list(reversed(range(nrows))),ncols)
-    xgrid = xgrid[:n]
-    ygrid = ygrid[:n]
-    x = [item*thumb for item in xgrid]
-    y = [item*thumb for item in ygrid]
-
-    return w,h,list(zip(x,y)) # py3 zip
-
-def _gridcoordscirclemax(side,thumb):
-    x,y = list(range(side))*side,repeat(range(side),side) # py3 range
-    gridlist = list(zip(x,y))
-    maximus = (int(side/2),int(side/2)) # py3 defaults to float
-    return gridlist,maximus,[(int(maximus[0]*thumb),int(maximus[1]*thumb))]
-
-def _gridcoordscircle(n,maximus,gridlist,thumb):
-    # compute distances from center; sort by distance
-    maximusarray = np.array(maximus) # for computing distance
-    dists = [np.linalg.norm(maximusarray-np.array(item)) for item in gridlist]
-    tmp = pd.DataFrame({"gridlist":gridlist,"dists":dists})
-    tmp.sort_values(by='dists',inplace=True) # ascending
-    gridlist = tmp.gridlist.iloc[:n-1] # n-1 bc we removed maximus
-    return [(int(item[0]*thumb),int(item[1]*thumb)) for item in gridlist]
+    cells = np.arange(n)
+    x = cells % ncols * thumb
+    y = (nrows - 1 - cells // ncols) * thumb # fills from the bottom up
+
+    return w,h,np.column_stack((x,y))
+
+@lru_cache(maxsize=32)
+def _circleorder(side):
+    """
+    Grid cells of a side x side square, ordered by distance from the center
+    cell (which comes first). Cached per 'side' and returned read-only, since
+    every circular montage of the same size shares the same spiral.
+    """
+    cells = np.arange(side*side)
+    grid = np.column_stack((cells % side,cells // side))
+    center = int(side/2)
+    grid = np.delete(grid,center*side+center,axis=0)
+    dists = np.sqrt(((grid - center)**2).sum(axis=1))
+    order = np.vstack(([[center,center]],grid[np.argsort(dists)]))
+    order.setflags(write=False)
+    return order
+
+def _gridcoordscircle(n,side,thumb):
+    return _circleorder(side)[:n] * thumb
 
 def polar2cartesian(r: int, theta: int) -> tuple:
     return (r * cos(theta), r * sin(theta))
@@ -610,26 +1211,25 @@ def _bin2phideg(nbins,binnum):
 
 def _histcoordscart(n,binlabel,plotheight,thumb):
     xcoord = thumb * binlabel
-    ycoord = plotheight - thumb # bc paste loc is UPPER left corner
-    ycoords = arange(ycoord,plotheight-thumb*(n+1),-thumb)
-    return [tuple((xcoord,item)) for item in ycoords]
+    ycoords = plotheight - thumb * (np.arange(n) + 1) # bc paste loc is UPPER left corner
+    return np.column_stack((np.full(n,xcoord),ycoords))
 
 def _histcoordspolar(n,binlabel,binmax,nbins,thumb):
-    rhos = arange(binmax,binmax-n-1,-1)
+    rhos = binmax - np.arange(n)
     phi = _bin2phi(nbins,binlabel)
-    phis = repeat(_bin2phideg(nbins,binlabel),n)
-    xycoords = [polar2cartesian(rho,phi) for rho in rhos]
-    x = [int((item[0]+binmax)*thumb) for item in xycoords]
-    y = [int((binmax-item[1])*thumb) for item in xycoords]
-    return list(zip(x,y)),phis # py3 zip
+    phis = np.full(n,_bin2phideg(nbins,binlabel))
+    x,y = polar2cartesian(rhos,phi)
+    x = ((x+binmax)*thumb).astype(int)
+    y = ((binmax-y)*thumb).astype(int)
+    return np.column_stack((x,y)),phis
 
 def _scalecart(xcol,ycol,xdomain,ydomain,side,thumb):
     xcolpct = _pct(xcol,xdomain)
     ycolpct = _pct(ycol,ydomain)
     xpasterange = side[0] - thumb # otherwise will cut off extremes
     ypasterange = side[1] - thumb # otherwise will cut off extremes
-    x = [int(item*xpasterange) for item in xcolpct]
-    y = [int((1-item)*ypasterange) for item in ycolpct]
+    x = (xcolpct*xpasterange).astype(int)
+    y = ((1-ycolpct)*ypasterange).astype(int)
     return x,y
 
 def _scalepol(xcol,ycol,xdomain,ydomain,side,thumb):
@@ -637,22 +1237,21 @@ def _scalepol(xcol,ycol,xdomain,ydomain,side,thumb):
     xcolpct = _pct(xcol,xdomain)
     ycolpct = _pct(ycol,ydomain)
     # derive polar coordinates from percentiles and 360 degree std
-    rhos = [item for item in xcolpct] # unit radius
-    phis = [item*float(360) for item in ycolpct]
-    phiradians = [radians(item) for item in phis]
+    rhos = xcolpct # unit radius
+    phis = ycolpct*float(360)
     # convert these to xy coordinates in (-1,1) range
-    polcoords = list(zip(rhos,phiradians))
-    xycoords = [polar2cartesian(item[0],item[1]) for item in polcoords]
+    x,y = polar2cartesian(rhos,radians(phis))
     # convert to canvas coordinates
     pasterange = side[0] - thumb # otherwise will cut off extremes
     radius = float(pasterange)/2
-    x = [int(item[0]*radius+radius) for item in xycoords]
-    y = [int(radius-item[1]*radius) for item in xycoords]
+    x = (x*radius+radius).astype(int)
+    y = (radius-y*radius).astype(int)
     return x,y,phis
 
 def _pct(col,domain):
     """This will fail on missing data"""
-    if domain==None:
+    col = np.asarray(col,dtype=float)
+    if domain is None:
         dmin = col.min()
         dmax = col.max()
     else:
@@ -660,7 +1259,7 @@ def _pct(col,domain):
         dmin = domain[0]
         dmax = domain[1]
     drange = dmax - dmin
-    return [(item - dmin) / float(drange) for item in col]
+    return (col - dmin) / float(drange)
 
 def getfontsize(bbox):
     fontWidth = bbox[2] - bbox[0]
@@ -689,6 +1288,7 @@ def _idx(im,i):
 
     draw.text((pos,pos),text,font=font,fill='black')
 
+@_timed('annote')
 def _annote(im,note):
     draw = ImageDraw.Draw(im)
     text = str(note)
@@ -732,38 +1332,87 @@ def _dot(thumb):
                            radius=radius,outline=None,fill='white')
     return im
 
+@_timed('stampdots')
+def _stampdots(canvas,coords,thumb,flip=None,chunksize=4096):
+
+    """
+    Dot-mode rendering straight into a pixel array. The dot's mask is computed
+    once, as pixel offsets, and written at every coordinate in bulk (in chunks,
+    to bound memory), instead of making and alpha-pasting one RGBA image per
+    item. Output matches pasting _dot(thumb) item by item.
+
+    Only the bounding box of the dots is copied out of the canvas and back,
+    not the whole canvas: a histogram stamps one bin at a time, and a bin's
+    column is a sliver of the canvas.
+    """
+
+    dot = _dot(thumb)
+    if flip==True:
+        dot = dot.transpose(method=Image.Transpose.FLIP_TOP_BOTTOM)
+    dy,dx = np.nonzero(np.asarray(dot)[:,:,3] > 0)
+    fill = np.asarray(dot.convert(canvas.mode))[dy[0],dx[0]]
+
+    w,h = canvas.size
+    coords = np.asarray(coords,dtype=int).reshape(-1,2)
+    if len(coords)==0:
+        return
+    x0 = max(coords[:,0].min() + dx.min(),0) # paste clips at the edges
+    y0 = max(coords[:,1].min() + dy.min(),0)
+    x1 = min(coords[:,0].max() + dx.max() + 1,w)
+    y1 = min(coords[:,1].max() + dy.max() + 1,h)
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    box = (int(x0),int(y0),int(x1),int(y1))
+    arr = np.array(canvas.crop(box))
+    bw,bh = box[2] - box[0],box[3] - box[1]
+    flat = arr.reshape(bw*bh,-1)
+
+    for start in range(0,len(coords),chunksize):
+        chunk = coords[start:start+chunksize]
+        xs = chunk[:,0,None] + dx - box[0]
+        ys = chunk[:,1,None] + dy - box[1]
+        inside = (xs>=0)&(xs<bw)&(ys>=0)&(ys<bh)
+        flat[ys[inside]*bw + xs[inside]] = fill
+
+    canvas.paste(Image.fromarray(arr,canvas.mode),box[:2])
+
 def _paste(pathcol,thumb,idx,canvas,coords,
            coordinates=None,phis=None,notecol=None,flip=None,dot=None):
     if isinstance(pathcol, string_types): # bc this is allowable in _typecheck
         raise TypeError("'pathcol' must be a pandas Series")
 
+    if all([dot==True,coordinates!='polar',idx!=True,notecol is None]):
+        return _stampdots(canvas,coords,thumb,flip) # plain dots, no per-item images
+
+    coords = _pastecoords(coords)
+
+    if dot!=True:
+        fetched = _prefetch(pathcol) # remote images, concurrently and cached
+
+    atlas = None if dot==True else _atlasfor(thumb)
+
     counter=-1
     for i in pathcol.index:
         counter+=1
         impath = pathcol.loc[i]
-        try:
-            if dot==True:
-                im = _dot(thumb)
-            elif isinstance(impath,string_types):
-                if impath.startswith(("http://", "https://")):
-                    response = requests.get(impath, stream=True)
-                    im = Image.open(response.raw)
-                else:
-                    im = Image.open(impath)
-            elif isinstance(impath,Image.Image):
-                im = deepcopy(impath) # when pathcol is a list of PIL images
-            else:
-                im = _placeholder(thumb)
-        except Exception as e:
-            print(e)
-            im = _placeholder(thumb)
-
-        if isinstance(thumb,tuple):
-            im.thumbnail((thumb[0],thumb[1]),Image.Resampling.LANCZOS)
-        elif isinstance(thumb,int_types):        
-            im.thumbnail((thumb,thumb),Image.Resampling.LANCZOS)
-        
-        im = im.convert('RGBA') # often unnecessary but for rotation and glyphs
+        if dot==True:
+            im = _dot(thumb)
+        else:
+            im = _thumbnail(impath,thumb,fetched,atlas)
+
+        """
+        Opaque images are converted straight to the canvas mode and pasted
+        without a mask, which is a plain copy of pixels. Only images that may
+        be transparent (glyphs, dots, PNGs with alpha) or that will be rotated
+        (which exposes transparent corners) go through RGBA compositing.
+        """
+        opaque = all([coordinates!='polar',_isopaque(im)])
+        if opaque:
+            im = im.convert(canvas.mode)
+        else:
+            im = im.convert('RGBA')
+
         if idx==True: # idx labels placed after thumbnail
             _idx(im,i)
         if notecol is not None:
@@ -775,9 +1424,168 @@ def _paste(pathcol,thumb,idx,canvas,coords,
             phi = phis[counter]
             if 90 < phi < 270:
                 phi = phi + 180 # avoids upside down images
-            im = im.rotate(phi,expand=1) # expand so it won't clip the corners
+            with _stage('rotate'):
+                im = im.rotate(phi,expand=1) # expands so it won't clip the corners
 
-        canvas.paste(im,coords[counter],im) # im is a mask for itself
+        with _stage('paste'):
+            if opaque:
+                canvas.paste(im,coords[counter])
+            else:
+                canvas.paste(im,coords[counter],im) # im is a mask for itself
+
+"""
+Preview level for progressive rendering (see plot.progressive): 0 renders
+normally; 1 renders every image as a block of its mean colour; 2 renders
+coarse thumbnails. Set only for the duration of a preview pass.
+
+Both previews come from one small decode per image (at reduced scale, where
+the format allows it), whose full size, mean colour, and tiny thumbnail of
+at most PREVIEW_SIDE pixels are kept by path, so later passes and later
+progressive plots don't open the file again. The least recently used are
+dropped past PREVIEW_MAXBYTES of tiny thumbnails.
+"""
+
+PREVIEW = 0
+PREVIEW_SIDE = 32
+PREVIEW_MAXBYTES = 2**27 # 128MB
+
+_PREVIEWS = OrderedDict() # path -> (full size, mean colour, tiny thumbnail)
+_PREVIEWBYTES = 0
+_PREVIEWLOCK = threading.Lock()
+
+def _setpreview(level):
+    global PREVIEW
+    PREVIEW = level
+
+def _thumbnail(impath,thumb,fetched,atlas=None):
+
+    """
+    Opens and thumbnails one pathcol item, or gathers it from the session
+    atlas when one is active at this thumb size. Unreadable items become
+    placeholders.
+    """
+
+    if PREVIEW > 0 and isinstance(impath,string_types):
+        preview = _previewget(impath)
+        if preview is not None:
+            return _previewthumbnail(preview,thumb)
+
+    cacheable = all([atlas is not None,isinstance(impath,string_types)])
+    if cacheable:
+        im = atlas.get(impath)
+        if im is not None:
+            _count('atlas.hit')
+            return im
+        _count('atlas.miss')
+
+    try:
+        if isinstance(impath,string_types):
+            if _isurl(impath):
+                localpath = fetched[impath]
+                if isinstance(localpath,Exception):
+                    raise localpath
+                im = Image.open(localpath)
+            else:
+                im = Image.open(impath)
+        elif isinstance(impath,Image.Image):
+            im = deepcopy(impath) # when pathcol is a list of PIL images
+        else:
+            return _placeholder(thumb)
+    except Exception as e:
+        print(e)
+        return _placeholder(thumb)
+
+    if PREVIEW > 0:
+        preview = _previewdecode(im)
+        if isinstance(impath,string_types):
+            _previewput(impath,preview)
+        return _previewthumbnail(preview,thumb)
+
+    if isinstance(thumb,tuple):
+        im = _decodethumbnail(im,(thumb[0],thumb[1]))
+    elif isinstance(thumb,int_types):
+        im = _decodethumbnail(im,(thumb,thumb))
+
+    if cacheable:
+        atlas.put(impath,im)
+
+    return im
+
+def _decodethumbnail(im,size):
+
+    """
+    im.thumbnail(size,LANCZOS), timed as one stage: PIL drafts, decodes, and
+    resizes together, and splitting them would change its rounding. The
+    byte count is the full-size image's, an upper bound for formats that
+    decode at reduced scale.
+    """
+
+    _count('decode.bytes',im.width*im.height*len(im.getbands()))
+    with _stage('thumbnail'):
+        im.thumbnail(size,Image.Resampling.LANCZOS)
+    return im
+
+def _previewdecode(im):
+    """Full size, mean colour, and tiny RGB thumbnail, from one small decode"""
+    fullsize = im.size # from the header, before draft() shrinks it
+    im.draft('RGB',(PREVIEW_SIDE,PREVIEW_SIDE)) # no-op for formats without scaled decoding
+    tiny = im.convert('RGB')
+    tiny.thumbnail((PREVIEW_SIDE,PREVIEW_SIDE),Image.Resampling.BOX)
+    color = tiny.resize((1,1),Image.Resampling.BOX).getpixel((0,0))
+    return fullsize,color,tiny
+
+def _previewget(impath):
+    with _PREVIEWLOCK:
+        preview = _PREVIEWS.get(impath)
+        if preview is not None:
+            _PREVIEWS.move_to_end(impath)
+        return preview
+
+def _previewput(impath,preview):
+    global _PREVIEWBYTES
+    with _PREVIEWLOCK:
+        if impath in _PREVIEWS:
+            return
+        _PREVIEWS[impath] = preview
+        _PREVIEWBYTES += preview[2].width * preview[2].height * 3
+        while _PREVIEWBYTES > PREVIEW_MAXBYTES and len(_PREVIEWS) > 1:
+            _,(_,_,tiny) = _PREVIEWS.popitem(last=False) # evict the stalest
+            _PREVIEWBYTES -= tiny.width * tiny.height * 3
+
+def _previewthumbnail(preview,thumb):
+
+    """
+    Cheap stand-in for a thumbnail, at the size the thumbnail would have:
+    a block of the image's mean colour (PREVIEW 1), or its tiny thumbnail
+    resized with nearest-neighbour (PREVIEW 2).
+    """
+
+    if isinstance(thumb,tuple):
+        tw,th = thumb
+    else:
+        tw,th = thumb,thumb
+
+    (w,h),color,tiny = preview
+    scale = min(tw/float(w),th/float(h),1.0)
+    size = (max(int(round(w*scale)),1),max(int(round(h*scale)),1))
+
+    if PREVIEW==1:
+        return Image.new('RGB',size,color)
+    else:
+        return tiny.resize(size,Image.Resampling.NEAREST)
+
+def _isopaque(im):
+    if 'transparency' in im.info:
+        return False
+    if im.mode in ['1','L','P','RGB','CMYK','YCbCr','LAB','HSV']:
+        return True
+    if im.mode in ['RGBA','LA','PA','RGBa','La']:
+        return im.getchannel('A').getextrema()[0]==255 # alpha present but unused
+    return False
+
+def _pastecoords(coords):
+    """(n,2) coordinate array to the list of int tuples PIL's paste expects"""
+    return [tuple(item) for item in np.asarray(coords,dtype=int).tolist()]
 
 def _round(x,direction='down'):
     if direction=='down':
@@ -800,6 +1608,77 @@ def _bottom_left_corner(im,thumb,bg):
     
     return canvas
 
+def _decimate(xs,ys,side,method=None):
+
+    """
+    Indices of the vertices to draw for a line of pixel coordinates 'xs','ys'.
+    All of them unless 'method' is given and the line has more than twice as
+    many points as the plot has pixel columns ('side'); below that, dropping
+    vertices saves little drawing time. Otherwise drawing cost is bounded by
+    'side' rather than by the length of the series.
+    """
+
+    n = len(xs)
+    if method is None or n <= 2*side:
+        return np.arange(n)
+    if method=='minmax':
+        return _minmaxenvelope(xs,ys)
+    elif method=='lttb':
+        return _lttb(xs,ys,side)
+
+def _minmaxenvelope(xs,ys):
+
+    """
+    Per pixel column, the first, lowest, highest, and last points, in series
+    order. At most four vertices per column, and every extreme survives, so
+    the drawn envelope looks the same as the full line.
+    """
+
+    columns = xs.astype(int)
+    starts = np.flatnonzero(np.diff(columns,prepend=columns[0]-1))
+    counts = np.diff(np.append(starts,len(xs)))
+    ends = starts + counts - 1
+
+    lows = _firstwhere(ys==np.repeat(np.minimum.reduceat(ys,starts),counts),starts)
+    highs = _firstwhere(ys==np.repeat(np.maximum.reduceat(ys,starts),counts),starts)
+
+    return np.unique(np.concatenate([starts,lows,highs,ends]))
+
+def _firstwhere(mask,starts):
+    """Per group starting at 'starts', the index of the first True in 'mask'"""
+    hits = np.flatnonzero(mask)
+    return hits[np.searchsorted(hits,starts)]
+
+def _lttb(xs,ys,nout):
+
+    """
+    Largest-triangle-three-buckets downsampling to 'nout' points: the first
+    and last points are kept, and from each bucket in between, the point
+    forming the largest triangle with the previous pick and the next
+    bucket's centroid.
+    """
+
+    n = len(xs)
+    edges = np.linspace(1,n-1,nout-1).astype(int)
+
+    keep = np.empty(nout,dtype=int)
+    keep[0] = 0
+    keep[-1] = n - 1
+    prev = 0
+    for b in range(nout-2):
+        lo,hi = edges[b],edges[b+1]
+        if b+2 < len(edges):
+            nextlo,nexthi = edges[b+1],edges[b+2]
+            cx,cy = xs[nextlo:nexthi].mean(),ys[nextlo:nexthi].mean()
+        else:
+            cx,cy = xs[-1],ys[-1]
+        ax,ay = xs[prev],ys[prev]
+        areas = np.abs((ax-cx) * (ys[lo:hi]-ay) - (ax-xs[lo:hi]) * (cy-ay))
+        prev = lo + int(np.argmax(areas))
+        keep[b+1] = prev
+
+    return keep
+
 def _progressBar(pathcol):
     n = len(pathcol)
     breaks = [int(n * item) for item in arange(.05,1,.05)]
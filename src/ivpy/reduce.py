@@ -1,22 +1,89 @@
+import numpy as np
 import pandas as pd
-from sklearn.manifold import TSNE
-from sklearn.decomposition import PCA
-import umap as ump
 from .data import _typecheck
 
+"""
+scikit-learn and umap-learn are imported on first use; both are slow to load
+and umap in particular compiles with numba at import time.
+"""
+
 #------------------------------------------------------------------------------
 
 def pca(X,**kwargs):
     _typecheck(**locals())
+    from sklearn.decomposition import PCA
     xy = PCA(**kwargs).fit_transform(X)
     return pd.DataFrame(xy,index=X.index)
 
-def tsne(X,**kwargs):
+"""
+tsne() and umap() can take a precomputed knn_graph() of X as 'graph', instead
+of finding neighbors again. t-SNE then fits the sparse distances directly
+(metric='precomputed'), and its perplexity defaults to the most the graph
+supports, at most 30 (perplexity p needs about 3p neighbors). UMAP takes the
+graph's neighbor lists and distances, and must run with the metric they were
+measured in: its own 'metric' is taken from the graph ('angular' becomes
+'cosine', with distances converted), and a conflicting one is refused.
+"""
+
+UMAP_METRICS = {'angular':'cosine','euclidean':'euclidean','manhattan':'manhattan'}
+
+def tsne(X,graph=None,**kwargs):
     _typecheck(**locals())
-    xy = TSNE(**kwargs).fit_transform(X)
+    from sklearn.manifold import TSNE
+    if graph is None:
+        xy = TSNE(**kwargs).fit_transform(X)
+    else:
+        from scipy.sparse import csr_matrix
+        knn_indices,knn_dists = _knnarrays(graph) # sklearn counts self too
+        n,k = knn_indices.shape
+        distances = csr_matrix((knn_dists.ravel(),knn_indices.ravel(),
+                                np.arange(n+1) * k),shape=(n,n))
+        kwargs.setdefault('perplexity',min(30.0,(k - 2) / 3.0))
+        kwargs.setdefault('init','random') # 'pca' needs coordinates
+        xy = TSNE(metric='precomputed',**kwargs).fit_transform(distances)
     return pd.DataFrame(xy,index=X.index)
 
-def umap(X,**kwargs):
+def umap(X,graph=None,**kwargs):
     _typecheck(**locals())
+    import umap as ump
+    if graph is not None:
+        knn_indices,knn_dists = _knnarrays(graph)
+        graphmetric = getattr(graph,'metric',None)
+        if graphmetric is not None: # from knn_graph(); otherwise trust kwargs
+            if graphmetric not in UMAP_METRICS:
+                raise ValueError("""UMAP has no metric matching a '%s' graph; use
+                    knn_graph() with metric %s""" % (graphmetric,
+                                                     list(UMAP_METRICS)))
+            metric = UMAP_METRICS[graphmetric]
+            if kwargs.setdefault('metric',metric)!=metric:
+                raise ValueError("""'metric' %s doesn't match the graph's '%s';
+                    leave it out to use '%s'""" % (repr(kwargs['metric']),
+                                                   graphmetric,metric))
+            if graphmetric=='angular':
+                knn_dists = knn_dists**2 / 2 # sqrt(2 - 2cos) to 1 - cos
+        kwargs.setdefault('n_neighbors',knn_indices.shape[1])
+        kwargs['precomputed_knn'] = (knn_indices,knn_dists,None)
     xy = ump.UMAP(**kwargs).fit_transform(X)
     return pd.DataFrame(xy,index=X.index)
+
+def _knnarrays(graph):
+
+    """
+    Dense (n, k+1) neighbor and distance arrays from a knn_graph(), in UMAP's
+    layout: each row nearest first, starting with the item itself.
+    """
+
+    graph = graph.tocsr()
+    n = graph.shape[0]
+    lengths = np.diff(graph.indptr)
+    if (lengths!=lengths[0]).any():
+        raise ValueError("'graph' must have the same number of neighbors in every row")
+
+    rows = np.repeat(np.arange(n),lengths)
+    order = np.lexsort((graph.data,rows))
+    indices = graph.indices[order].reshape(n,lengths[0])
+    dists = graph.data[order].reshape(n,lengths[0])
+
+    knn_indices = np.hstack([np.arange(n)[:,np.newaxis],indices])
+    knn_dists = np.hstack([np.zeros((n,1),dtype=dists.dtype),dists])
+    return knn_indices,knn_dists
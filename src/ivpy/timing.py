@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+"""
+Opt-in profiling of the plot pipeline. Inside a `with profile():` block, or
+for the whole session when the IVPY_PROFILE environment variable is set, the
+stages of every plot (column filtering, decoding and thumbnailing, annotation,
+facet matting, pasting, ...) record their wall time and call counts, along
+with bytes decoded and cache hits. Outside of profiling, each hook costs one
+global lookup.
+
+    IVPY_PROFILE=1                  prints the table when Python exits
+    IVPY_PROFILE=/tmp/trace.json    also writes a Chrome trace there
+"""
+
+PROFILER = None
+
+#------------------------------------------------------------------------------
+
+@contextmanager
+def profile(trace=None,report=True):
+
+    """
+    Profiles the plot pipeline for the duration of the block.
+
+    Args:
+        trace (str) --- optional path; writes a Chrome trace (chrome://tracing
+            or Perfetto) of every stage call there
+        report (Boolean) --- whether to print the stage table at the end
+
+    The yielded profiler has the per-stage numbers in 'stats' and the
+    printable table from 'table()'.
+    """
+
+    global PROFILER
+
+    previous = PROFILER
+    profiler = _Profiler(trace=trace is not None)
+    PROFILER = profiler
+    try:
+        yield profiler
+    finally:
+        PROFILER = previous
+        profiler.finish()
+        if report:
+            print(profiler.table())
+        if trace is not None:
+            profiler.dump(trace)
+
+def _timed(name):
+    """Decorator: records every call of the function as stage 'name'"""
+    def decorate(func):
+        @wraps(func)
+        def timed(*args,**kwargs):
+            if PROFILER is None:
+                return func(*args,**kwargs)
+            with PROFILER.stage(name):
+                return func(*args,**kwargs)
+        return timed
+    return decorate
+
+class _NoStage:
+    def __enter__(self):
+        return self
+    def __exit__(self,*exc):
+        return False
+
+_NOSTAGE = _NoStage()
+
+def _stage(name):
+    """Context manager recording its block as stage 'name', when profiling"""
+    if PROFILER is None:
+        return _NOSTAGE
+    return PROFILER.stage(name)
+
+def _count(name,n=1):
+    """Adds 'n' to counter 'name', when profiling"""
+    if PROFILER is not None:
+        PROFILER.count(name,n)
+
+#------------------------------------------------------------------------------
+
+class _Profiler:
+
+    def __init__(self,trace=False):
+        self.stats = {} # stage -> [calls, seconds]
+        self.counters = {}
+        self.events = [] if trace else None
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.elapsed = None
+
+    @contextmanager
+    def stage(self,name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                entry = self.stats.setdefault(name,[0,0.0])
+                entry[0] += 1
+                entry[1] += end - start
+                if self.events is not None:
+                    self.events.append((name,start,end,threading.get_ident()))
+
+    def count(self,name,n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name,0) + n
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.start
+
+    def table(self):
+
+        """
+        One row per stage, slowest first. Stages nest (thumbnail runs inside a
+        plot, for instance), so times are inclusive and do not sum to the
+        total. Counters follow, with hit rates for each cache.
+        """
+
+        elapsed = self.elapsed
+        if elapsed is None:
+            elapsed = time.perf_counter() - self.start
+
+        lines = ["%-14s %8s %10s %10s %6s" % ('stage','calls','total s',
+                                              'mean ms','%')]
+        rows = sorted(self.stats.items(),key=lambda item: -item[1][1])
+        for name,(calls,seconds) in rows:
+            lines.append("%-14s %8d %10.3f %10.3f %6.1f" % (
+                name,calls,seconds,1000*seconds/calls,100*seconds/elapsed))
+        lines.append("%-14s %8s %10.3f" % ('(profiled)','',elapsed))
+
+        counters = self.counters
+        if counters.get('decode.bytes'):
+            lines.append("decoded up to %.1f MB" % (counters['decode.bytes']/2**20))
+        for cache in ['atlas','fetch']:
+            hits = counters.get(cache + '.hit',0)
+            misses = counters.get(cache + '.miss',0)
+            if hits + misses > 0:
+                lines.append("%s cache: %d hits, %d misses (%.0f%% hit rate)" % (
+                    cache,hits,misses,100.0*hits/(hits+misses)))
+
+        return "\n".join(lines)
+
+    def dump(self,path):
+        """Writes the recorded stage calls as a Chrome trace JSON file"""
+        pid = os.getpid()
+        events = [{'name':name,'cat':'ivpy','ph':'X','pid':pid,'tid':tid,
+                   'ts':(start-self.start)*1e6,'dur':(end-start)*1e6}
+                  for name,start,end,tid in self.events]
+        for name,value in self.counters.items():
+            events.append({'name':name,'cat':'ivpy','ph':'C','pid':pid,
+                           'ts':(self.elapsed or 0)*1e6,'args':{name:value}})
+        with open(path,'w') as f:
+            json.dump({'traceEvents':events,'displayTimeUnit':'ms'},f)
+
+#------------------------------------------------------------------------------
+
+def _profilefromenv():
+
+    """
+    IVPY_PROFILE turns profiling on for the whole session; the table is
+    printed at exit, and if the value is a .json path, a trace is written.
+    """
+
+    global PROFILER
+
+    value = os.environ.get('IVPY_PROFILE','')
+    if value in ['','0']:
+        return
+
+    trace = value if value.endswith('.json') else None
+    PROFILER = _Profiler(trace=trace is not None)
+
+    def report(profiler=PROFILER):
+        profiler.finish()
+        print(profiler.table())
+        if trace is not None:
+            profiler.dump(trace)
+
+    atexit.register(report)
+
+_profilefromenv()
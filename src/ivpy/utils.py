@@ -4,14 +4,9 @@ import numpy as np
 from PIL import Image
 from six import string_types
 #import image_slicer
-from glob2 import glob
-import matplotlib.pyplot as plt
 
 from .data import _pathfilter,_typecheck
 from .extract import _read_process_image
-from skimage.color import rgb2gray
-from skimage.io import imsave
-import tifffile as tiff
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -104,6 +99,8 @@ def tifpass(savedir=None,pathcol=None,verbose=False,gain=250,N=1365,
         return pathcol_tifpassed
 
 def _tifpass(impath,savedir,gain,N,include_dir,low_pass_sigma,high_pass_sigma,low_pass_apply,plainsave):
+    import matplotlib.pyplot as plt # imported here; slow, and picks a backend
+
     try:
         img = _read_process_image(impath,gain,N,low_pass_sigma,high_pass_sigma,low_pass_apply)
 
@@ -161,8 +158,12 @@ def tifprocess(savedir=None,pathcol=None,verbose=False,N=1365,include_dir=False)
         return pd.Series(pathcol_tifprocessed,index=pathcol.index)
 
 def _tifprocess(impath,savedir,N,include_dir):
+    from skimage.color import rgb2gray
+    from skimage.io import imsave
+
     try:
         try:
+            import tifffile as tiff
             img = tiff.imread(impath)
         except:
             # if imagecodecs is missing